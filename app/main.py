@@ -1,63 +1,160 @@
+import asyncio
 import logging
 import os
 import uuid
-from contextlib import asynccontextmanager
-from typing import Annotated, Any, Dict
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Annotated, Any, AsyncIterator, Dict, Optional
 
+import anyio.to_thread
 from dotenv import load_dotenv
 from fastapi import Depends, FastAPI, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from langdetect import detect
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from lingua import Language, LanguageDetector, LanguageDetectorBuilder
 
 from .models.schemas import (
     GenerateDebugResponse,
     GenerateRequest,
     GenerateResponse,
+    SourceDocument,
     Token,
     UploadRequest,
 )
+from .rag.embeddings import get_embeddings
+from .rag.http import close_http_clients
 from .rag.loader import Loader
 from .rag.rag_pipeline import RAGPipeline
+from .rag.settings import CHECKPOINT_DB
 from .utils.auth import authenticate, create_access_token, verify_token
+from .utils.responses import DefaultORJSONResponse, PydanticResponse, dumps
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+if os.getenv("ENV", "development") == "development":
+    load_dotenv()
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Initialize the RAG pipeline."""
-    logger.info("⏳ Starting application initialization...")
+ALLOWED_ORIGINS = tuple(
+    origin.strip()
+    for origin in (os.getenv("ALLOWED_ORIGINS") or "").split(",")
+    if origin.strip()
+)
+if not ALLOWED_ORIGINS:
+    logger.warning("ALLOWED_ORIGINS is not set, cross-origin requests are rejected")
 
-    logger.info("⚡ Initializing English RAG pipeline...")
-    en_loader = Loader(language="en", collection_name="luiseduromp_rag")
-    en_vectorstore = en_loader.init_vectorstore()
-    rag_pipeline = RAGPipeline(vectorstore=en_vectorstore, language="en")
-    logger.info("✅ English RAG pipeline initialized successfully")
+# Worker threads available for the blocking loader calls and sync endpoints
+THREAD_LIMIT = 64
 
-    logger.info("⚡ Initializing Spanish RAG pipeline...")
-    es_loader = Loader(language="es", collection_name="luiseduromp_esp")
-    es_vectorstore = es_loader.init_vectorstore()
-    esp_pipeline = RAGPipeline(vectorstore=es_vectorstore, language="es")
-    logger.info("✅ Spanish RAG pipeline initialized successfully")
+# Detection time grows with text length; the start of a question is enough
+LANG_DETECT_MAX_CHARS = 200
 
-    app.state.rag_pipeline = rag_pipeline
-    app.state.esp_pipeline = esp_pipeline
 
-    logger.info(
-        "✅ All RAG pipelines initialized - Application ready to serve requests"
+def init_pipeline(
+    language: str,
+    collection_name: str,
+    checkpointer: Optional[BaseCheckpointSaver] = None,
+) -> tuple[Loader, RAGPipeline]:
+    """
+    Build the loader, vector store and RAG pipeline for a single language.
+
+    The loader and the pipeline share one Chroma handle, so the collection's
+    SQLite connection and HNSW index are only loaded once; it must not be
+    re-opened elsewhere.
+    """
+    logger.info("⚡ Initializing %s RAG pipeline...", language)
+    loader = Loader(language=language, collection_name=collection_name)
+    vectorstore = loader.init_vectorstore()
+    pipeline = RAGPipeline(
+        vectorstore=vectorstore, language=language, checkpointer=checkpointer
     )
-    yield
-    logger.info("👋 Application shutdown complete")
+    logger.info("✅ %s RAG pipeline initialized successfully", language)
+    return loader, pipeline
 
 
-app = FastAPI(lifespan=lifespan)
+def detect_document_language(url: str) -> str:
+    """Return the language of a document from its `EN`/`ES` filename prefix."""
+    filename = os.path.basename(url).split("?")[0].lower()
+    return "es" if filename.startswith("es") else "en"
 
-if os.getenv("ENV", "development") == "development":
-    load_dotenv()
 
-ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS").split(",")
+def build_language_detector() -> LanguageDetector:
+    """Build an English/Spanish detector with its models loaded up front."""
+    return (
+        LanguageDetectorBuilder.from_languages(Language.ENGLISH, Language.SPANISH)
+        .with_preloaded_language_models()
+        .build()
+    )
+
+
+def detect_language(detector: LanguageDetector, text: str) -> str:
+    """Return "es" for Spanish text and "en" otherwise."""
+    language = detector.detect_language_of(text[:LANG_DETECT_MAX_CHARS])
+    return "es" if language == Language.SPANISH else "en"
+
+
+async def open_checkpointer(stack: AsyncExitStack) -> Optional[BaseCheckpointSaver]:
+    """
+    Open the SQLite conversation checkpointer when `CHECKPOINT_DB` is set.
+
+    SQLite in WAL mode lets every worker process resume any conversation,
+    instead of each keeping its own in-memory history. Both language
+    pipelines share it, so a conversation keeps one history per thread_id.
+    This requires the `sqlite-checkpoints` extra.
+
+    Returns:
+        The checkpointer (closed with `stack`), or None for in-memory ones
+    """
+    if not CHECKPOINT_DB:
+        return None
+
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    logger.info("Persisting conversations to %s", CHECKPOINT_DB)
+    checkpointer = await stack.enter_async_context(
+        AsyncSqliteSaver.from_conn_string(CHECKPOINT_DB)
+    )
+    await checkpointer.setup()
+    return checkpointer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize the English and Spanish RAG pipelines concurrently."""
+    logger.info("⏳ Starting application initialization...")
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREAD_LIMIT
+
+    async with AsyncExitStack() as stack:
+        # Closed even if startup fails. The embeddings hold the shared clients,
+        # so they are dropped too and a later startup in this process (tests,
+        # reloads) builds both again.
+        stack.push_async_callback(close_http_clients)
+        stack.callback(get_embeddings.reset)
+        checkpointer = await open_checkpointer(stack)
+
+        (en_loader, rag_pipeline), (es_loader, esp_pipeline), lang_detector = (
+            await asyncio.gather(
+                asyncio.to_thread(init_pipeline, "en", "luiseduromp_rag", checkpointer),
+                asyncio.to_thread(init_pipeline, "es", "luiseduromp_esp", checkpointer),
+                asyncio.to_thread(build_language_detector),
+            )
+        )
+
+        app.state.rag_pipeline = rag_pipeline
+        app.state.esp_pipeline = esp_pipeline
+        app.state.lang_detector = lang_detector
+        app.state.loaders = {"en": en_loader, "es": es_loader}
+
+        logger.info(
+            "✅ All RAG pipelines initialized - Application ready to serve requests"
+        )
+        yield
+    logger.info("👋 Application shutdown complete")
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=DefaultORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -66,6 +163,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Added last so it wraps CORS and compresses the final response bytes
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
 
 
 @app.get("/")
@@ -77,7 +176,7 @@ def read_root():
 @app.post("/token", response_model=Token)
 async def get_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     """Retrieve an access token for authentication."""
-    if not authenticate(form_data.username, form_data.password):
+    if not await authenticate(form_data.username, form_data.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -92,56 +191,134 @@ async def get_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     }
 
 
-@app.post("/generate", response_model=GenerateResponse)
-async def generate_answer(
-    request: Request, body: GenerateRequest, _: Annotated[str, Depends(verify_token)]
-) -> Dict[str, Any]:
+def select_pipeline(request: Request, body: GenerateRequest) -> tuple[RAGPipeline, str]:
     """
-    Generate an answer to a question using the RAG pipeline.
+    Pick the RAG pipeline matching the question's language.
 
     Args:
+        request: The incoming request, holding the pipelines in `app.state`
         body: The request containing the question
     Returns:
-        Dict containing the answer and source documents
+        Tuple with the pipeline and the thread_id to use
     """
-    rag_pipeline = request.app.state.rag_pipeline
-    esp_pipeline = request.app.state.esp_pipeline
+    state = request.app.state
+    language = detect_language(state.lang_detector, body.question)
 
-    try:
-        logger.info("Generating RAG answer")
+    if language == "es":
+        pipeline = state.esp_pipeline
+        logger.info("Using Spanish RAG pipeline")
+    else:
+        pipeline = state.rag_pipeline
+        logger.info("Using English RAG pipeline")
 
-        language = detect(body.question)
+    thread_id = body.thread_id or str(uuid.uuid4())
+    logger.info("Using thread_id: %s", thread_id)
+    return pipeline, thread_id
 
-        if language == "es":
-            pipeline = esp_pipeline
-            logger.info("Using Spanish RAG pipeline")
-        else:
-            pipeline = rag_pipeline
-            logger.info("Using English RAG pipeline")
 
-        thread_id = body.thread_id or str(uuid.uuid4())
-        logger.info("Using thread_id: %s", thread_id)
+async def run_generation(
+    request: Request, body: GenerateRequest
+) -> tuple[dict[str, Any], str]:
+    """
+    Run the RAG pipeline matching the question's language.
 
-        response = pipeline.generate_answer(
-            question=body.question,
-            thread_id=thread_id,
+    Args:
+        request: The incoming request, holding the pipelines in `app.state`
+        body: The request containing the question
+    Returns:
+        Tuple with the pipeline result and the thread_id used
+    Raises:
+        HTTPException: if the answer could not be generated
+    """
+    try:
+        pipeline, thread_id = select_pipeline(request, body)
+        response = await pipeline.generate_answer(
+            question=body.question, thread_id=thread_id
         )
-
-        return {
-            "status": "success",
-            "message": "Answer generated successfully",
-            "answer": response["answer"],
-            "sources": response["sources"],
-            "thread_id": thread_id,
-        }
+        return response, thread_id
     except Exception as e:
-        logger.error("Failed to generate answer: %s", str(e), exc_info=True)
+        logger.exception("Failed to generate answer")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate answer: {str(e)}",
         ) from e
 
 
+@app.post("/generate", response_model=GenerateResponse)
+async def generate_answer(
+    request: Request, body: GenerateRequest, _: Annotated[str, Depends(verify_token)]
+) -> PydanticResponse:
+    """
+    Generate an answer to a question using the RAG pipeline.
+
+    The response model is built with `model_construct`, since the pipeline output
+    is already trusted, and serialized with `model_dump_json`. Returning a
+    response object bypasses FastAPI's validation and `jsonable_encoder` walk;
+    `response_model` is kept for the OpenAPI docs only.
+
+    Args:
+        body: The request containing the question
+    Returns:
+        JSON response containing the answer and source documents
+    """
+    logger.info("Generating RAG answer")
+    response, thread_id = await run_generation(request, body)
+
+    return PydanticResponse(
+        GenerateResponse.model_construct(
+            status="success",
+            message="Answer generated successfully",
+            answer=response["answer"],
+            sources=[
+                SourceDocument.model_construct(**source)
+                for source in response["sources"]
+            ],
+            thread_id=thread_id,
+        )
+    )
+
+
+@app.post("/generate-stream")
+async def generate_answer_stream(
+    request: Request, body: GenerateRequest, _: Annotated[str, Depends(verify_token)]
+) -> StreamingResponse:
+    """
+    Generate an answer to a question, streaming it as Server-Sent Events.
+
+    Each `data:` event is a JSON object: `{"type": "token", "content": ...}`
+    for every piece of the answer as the LLM produces it, then one
+    `{"type": "done", ...}` event with the full answer, sources and
+    thread_id, or `{"type": "error", ...}` if generation fails.
+
+    Args:
+        body: The request containing the question
+    Returns:
+        `text/event-stream` response
+    """
+    logger.info("Streaming RAG answer")
+    pipeline, thread_id = select_pipeline(request, body)
+
+    async def events() -> AsyncIterator[bytes]:
+        try:
+            async for event in pipeline.stream_answer(
+                question=body.question, thread_id=thread_id
+            ):
+                if event["type"] == "done":
+                    event = {
+                        "type": "done",
+                        "answer": event["answer"],
+                        "sources": event["sources"],
+                        "thread_id": thread_id,
+                    }
+                yield b"data: " + dumps(event) + b"\n\n"
+        except Exception as e:
+            logger.exception("Failed to stream answer")
+            error = {"type": "error", "message": f"Failed to generate answer: {e}"}
+            yield b"data: " + dumps(error) + b"\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
 @app.post("/generate-debug", response_model=GenerateDebugResponse)
 async def generate_answer_debug(
     request: Request, body: GenerateRequest, _: Annotated[str, Depends(verify_token)]
@@ -156,49 +333,29 @@ async def generate_answer_debug(
     Returns:
         Dict containing the answer, rewritten question, and source documents
     """
-    rag_pipeline = request.app.state.rag_pipeline
-    esp_pipeline = request.app.state.esp_pipeline
-
-    try:
-        logger.info("⚙️ Generating RAG answer (debug mode)")
-
-        language = detect(body.question)
-
-        if language == "es":
-            pipeline = esp_pipeline
-            logger.info("Using Spanish RAG pipeline")
-        else:
-            pipeline = rag_pipeline
-            logger.info("Using English RAG pipeline")
-
-        thread_id = body.thread_id or str(uuid.uuid4())
-        logger.info("Using thread_id: %s", thread_id)
+    logger.info("⚙️ Generating RAG answer (debug mode)")
+    response, thread_id = await run_generation(request, body)
 
-        response = pipeline.generate_answer(
-            question=body.question,
-            thread_id=thread_id,
-        )
-
-        return {
-            "status": "success",
-            "message": "Answer generated successfully",
-            "answer": response["answer"],
-            "sources": response["sources"],
-            "thread_id": thread_id,
-            "rewritten_question": response["rewritten_question"],
-        }
-    except Exception as e:
-        logger.error("Failed to generate answer: %s", str(e), exc_info=True)
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to generate answer: {str(e)}",
-        ) from e
+    return {
+        "status": "success",
+        "message": "Answer generated successfully",
+        "answer": response["answer"],
+        "sources": response["sources"],
+        "thread_id": thread_id,
+        "rewritten_question": response["rewritten_question"],
+    }
 
 
 @app.post("/upload")
 async def upload_file(
-    body: UploadRequest, _: Annotated[str, Depends(verify_token)]
+    request: Request, body: UploadRequest, _: Annotated[str, Depends(verify_token)]
 ) -> Dict[str, Any]:
-    loader = Loader()
-    loader.add_from_url(body.url)
+    language = detect_document_language(body.url)
+    loader = request.app.state.loaders[language]
+    await anyio.to_thread.run_sync(loader.add_from_url, body.url)
+
+    if language == "es":
+        request.app.state.esp_pipeline.clear_cache()
+    else:
+        request.app.state.rag_pipeline.clear_cache()
     return {"status": "success", "message": "Document uploaded successfully"}
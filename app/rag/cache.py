@@ -0,0 +1,99 @@
+import logging
+import threading
+import time
+from typing import Any, Optional
+
+import numpy as np
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """Two-tier, thread-safe cache of generated answers.
+
+    Tiers
+    - Exact: a TTL/LRU cache keyed by the standalone question string.
+    - Semantic: normalized question embeddings kept in a numpy matrix; a lookup
+      returns the entry of the most similar question when its cosine
+      similarity reaches `threshold`.
+
+    Constructor parameters
+    - maxsize (int): maximum number of entries kept in each tier.
+    - ttl (float): seconds an entry stays valid.
+    - threshold (float): minimum cosine similarity for a semantic hit.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, threshold: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self._exact: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: list[tuple[float, dict[str, Any]]] = []
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict[str, Any]]:
+        """Return the entry stored for exactly this key, if any."""
+        with self._lock:
+            return self._exact.get(key)
+
+    def get_similar(self, vector: list[float]) -> Optional[dict[str, Any]]:
+        """Return the entry of the most similar cached question, if any."""
+        query = self._normalize(vector)
+        with self._lock:
+            self._evict_expired()
+            if self._vectors is None or not self._entries:
+                return None
+
+            similarities = self._vectors @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+
+            logger.info("Semantic cache hit (similarity %.3f)", similarities[best])
+            return self._entries[best][1]
+
+    def put(self, key: str, vector: list[float], entry: dict[str, Any]):
+        """Store an entry under its exact key and its question embedding."""
+        row = self._normalize(vector)[np.newaxis, :]
+        with self._lock:
+            self._exact[key] = entry
+            self._vectors = (
+                row if self._vectors is None else np.vstack([self._vectors, row])
+            )
+            self._entries.append((time.monotonic() + self.ttl, entry))
+
+            overflow = len(self._entries) - self.maxsize
+            if overflow > 0:
+                self._drop_oldest(overflow)
+
+    def clear(self):
+        """Remove every entry from both tiers."""
+        with self._lock:
+            self._exact.clear()
+            self._vectors = None
+            self._entries = []
+
+    def _evict_expired(self):
+        """Drop semantic entries past their TTL (they are stored oldest first)."""
+        now = time.monotonic()
+        expired = 0
+        for expires_at, _ in self._entries:
+            if expires_at > now:
+                break
+            expired += 1
+        if expired:
+            self._drop_oldest(expired)
+
+    def _drop_oldest(self, count: int):
+        """Drop the `count` oldest semantic entries."""
+        self._entries = self._entries[count:]
+        self._vectors = self._vectors[count:] if self._entries else None
+
+    @staticmethod
+    def _normalize(vector: list[float]) -> np.ndarray:
+        """Return the vector as a unit-length float32 array."""
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
@@ -0,0 +1,48 @@
+import logging
+
+from langchain_core.embeddings import Embeddings
+
+from .http import get_async_http_client, get_http_client
+from .settings import EMBEDDINGS_MODEL, LOCAL_EMBEDDINGS_MODEL
+from .singleton import locked_singleton
+
+logger = logging.getLogger(__name__)
+
+
+def get_embeddings_model_name() -> str:
+    """Name of the embeddings model in use, stored in the collection metadata."""
+    return LOCAL_EMBEDDINGS_MODEL or EMBEDDINGS_MODEL
+
+
+@locked_singleton
+def get_embeddings() -> Embeddings:
+    """
+    Return the embeddings backend, built once per process.
+
+    The instance is shared by every `Loader` and `RAGPipeline`, so the HTTP
+    client (or the local ONNX model) is only set up once. When
+    `LOCAL_EMBEDDINGS_MODEL` is set, a quantized ONNX model (e.g.
+    `BAAI/bge-small-en-v1.5`) runs on the local CPU through FastEmbed, which
+    removes the per-chunk network round-trip to OpenAI during ingestion. This
+    requires the `local-embeddings` extra. Otherwise OpenAI embeddings are used.
+
+    Returns:
+        Embeddings instance
+    """
+    if LOCAL_EMBEDDINGS_MODEL:
+        from langchain_community.embeddings import FastEmbedEmbeddings
+
+        logger.info("Using local embeddings model: %s", LOCAL_EMBEDDINGS_MODEL)
+        return FastEmbedEmbeddings(model_name=LOCAL_EMBEDDINGS_MODEL)
+
+    from langchain_openai import OpenAIEmbeddings
+
+    # Chunks and questions are far below the model's 8191-token input limit,
+    # so the client-side tiktoken pass that re-splits long inputs is skipped
+    # and each batch is sent as one request of raw strings.
+    return OpenAIEmbeddings(
+        model=EMBEDDINGS_MODEL,
+        check_embedding_ctx_length=False,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+    )
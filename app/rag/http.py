@@ -0,0 +1,37 @@
+import logging
+
+import httpx
+
+from .singleton import locked_singleton
+
+logger = logging.getLogger(__name__)
+
+# Shared by the chat model and the embeddings of every pipeline, so OpenAI
+# calls reuse keep-alive connections (multiplexed over HTTP/2) instead of
+# each client opening and handshaking its own.
+HTTP_LIMITS = httpx.Limits(max_connections=200, max_keepalive_connections=50)
+HTTP_TIMEOUT = 60.0
+
+
+@locked_singleton
+def get_http_client() -> httpx.Client:
+    """Return the shared synchronous HTTP client, created on first use."""
+    return httpx.Client(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+
+
+@locked_singleton
+def get_async_http_client() -> httpx.AsyncClient:
+    """Return the shared asynchronous HTTP client, created on first use."""
+    return httpx.AsyncClient(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+
+
+async def close_http_clients():
+    """Close the shared HTTP clients that were created, e.g. on shutdown."""
+    sync_client = get_http_client.reset()
+    async_client = get_async_http_client.reset()
+
+    if sync_client is not None:
+        sync_client.close()
+    if async_client is not None:
+        await async_client.aclose()
+    logger.info("Closed shared HTTP clients")
@@ -1,21 +1,25 @@
+import functools
 import hashlib
 import logging
 import mimetypes
+import multiprocessing
 import os
+import threading
 import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 
-import fitz
-import requests
+import httpx
+import numpy as np
 from langchain.schema import Document
-from langchain.text_splitter import (
-    MarkdownHeaderTextSplitter,
-    RecursiveCharacterTextSplitter,
-)
+from langchain.text_splitter import MarkdownHeaderTextSplitter
 from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
+from semantic_text_splitter import TextSplitter
 
+from .embeddings import get_embeddings, get_embeddings_model_name
+from .http import get_http_client
 from .settings import (
     API_URL,
     CDN_URL,
@@ -23,24 +27,96 @@ from .settings import (
     CHUNK_SIZE,
     DATA_DIR,
     DATABASE_DIR,
-    EMBEDDINGS_MODEL,
+    DOWNLOAD_WORKERS,
+    EMBEDDINGS_BATCH_SIZE,
+    EMBEDDINGS_WORKERS,
+    FORCE_REINDEX,
+    MIN_CHUNK_TOKENS,
+    NEAR_DUPLICATE_THRESHOLD,
+    PARALLEL_PDF_MIN_PAGES,
+    PDF_WORKERS,
 )
+from .singleton import locked_singleton
+from .tokens import count_tokens
 
 logger = logging.getLogger(__name__)
 
+TEXT_EXTENSIONS = frozenset({".txt", ".md"})
+ALLOWED_EXTENSIONS = TEXT_EXTENSIONS | {".pdf"}
+MARKDOWN_HEADERS = (("#", "h1"), ("##", "h2"), ("###", "h3"))
+HEADER_LEVELS = tuple(level for _, level in MARKDOWN_HEADERS)
+# Any model using the cl100k_base encoding
+TOKENIZER_MODEL = "gpt-3.5-turbo"
+# Content hash stored with each chunk (as `hash_algo`) for deduplication
+HASH_ALGORITHM = "blake2b-128"
+# Rough characters per token, to locate the overlap at the edges of a chunk
+CHARS_PER_TOKEN = 4
+# Records fetched per page when loading the content-hash index
+HASH_INDEX_PAGE_SIZE = 1000
+
+# Timeout of a request to the document API or CDN
+DOWNLOAD_TIMEOUT = 10.0
+
+
+def _download(url: str, headers: Optional[dict[str, str]] = None) -> httpx.Response:
+    """
+    GET a URL of the document API or CDN.
+
+    Downloads go through the process-wide HTTP client, so they reuse its
+    keep-alive HTTP/2 connections instead of handshaking per file; its pool
+    has room for every download worker.
+    """
+    return get_http_client().get(
+        url, headers=headers, timeout=DOWNLOAD_TIMEOUT, follow_redirects=True
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _get_text_splitter(language: str) -> TextSplitter:
+    """
+    Build the token-based text splitter for a language once per process.
+
+    The splitter is the Rust `semantic-text-splitter`, measuring chunks with
+    the `cl100k_base` encoding. It splits on the largest semantic units
+    (paragraphs, lines, sentences, words) that fit, and is shared by every
+    `Loader` instance and by the leaf and generic splitting paths.
+    """
+    return TextSplitter.from_tiktoken_model(
+        TOKENIZER_MODEL,
+        CHUNK_SIZE.get(language, 350),
+        CHUNK_OVERLAP.get(language, 50),
+    )
+
+
+@locked_singleton
+def _get_pdf_executor() -> ProcessPoolExecutor:
+    """
+    Return the process pool for PDF text extraction, created on first use.
+
+    Workers are spawned rather than forked, since the server process runs
+    other threads, and are kept for the life of the process.
+    """
+    return ProcessPoolExecutor(
+        max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn")
+    )
+
 
 class Loader:
     """Manage loading, splitting, and indexing documents into a Chroma vector store.
 
     Responsibilities
-    - Initialize OpenAI embeddings and a Chroma vectorstore for a given collection.
+    - Initialize the embeddings (OpenAI, or a local quantized model when
+      `LOCAL_EMBEDDINGS_MODEL` is set) and a Chroma vectorstore for a given
+      collection, recording the embeddings model in the collection metadata.
     - Load documents from a remote API (S3-style) or a local `app/docs` directory.
-    - Accepts and parses `.md`, `.txt`, and `.pdf` files only.
+    - Accepts and parses `.md`, `.txt`, and `.pdf` files only. PDFs are loaded
+      as one Document per page, carrying the page number in the metadata.
     - Filter documents by language prefix (files start with `EN` or `ES`) using
       `_filter_by_lang` so only files matching `self.language` are loaded.
     - Split markdown with heading-aware splitter and other formats with a
-      generic recursive splitter, then deduplicate chunks by SHA-256 content
-      hash before adding to the vector store.
+      generic recursive splitter, merge undersized chunks into their
+      neighbours, then deduplicate chunks by BLAKE2b content hash (against an
+      in-memory index of stored hashes) before adding to the vector store.
 
     Constructor parameters
     - language (str): language hint used for filtering and splitters (e.g. "en").
@@ -50,7 +126,7 @@ class Loader:
     - data_url (str): base URL for remote document listing.
 
     Public methods of note
-    - load_from_url(url) -> Optional[Document]
+    - load_from_url(url) -> Optional[list[Document]]
     - load_documents() -> Optional[list[Document]]
     - add_from_url(url) -> Optional[str]
     - init_vectorstore() -> Chroma
@@ -64,12 +140,20 @@ class Loader:
         data_dir: str = DATA_DIR,
         data_url: str = API_URL,
     ):
-        self.embeddings = OpenAIEmbeddings(model=EMBEDDINGS_MODEL)
+        self.embeddings = get_embeddings()
         self.vectorstore = Chroma(
             collection_name=collection_name,
             persist_directory=database_dir,
             embedding_function=self.embeddings,
+            collection_metadata={"embeddings_model": get_embeddings_model_name()},
         )
+        self._check_embeddings_model()
+        # Read from the collection on first ingestion, so a restart that
+        # reuses the persisted collection does not page through it
+        self._hash_lock = threading.Lock()
+        self._hash_index: Optional[set[str]] = None
+        self._legacy_hash_index: set[str] = set()
+        self._etags: dict[str, str] = {}
         self.database_dir = database_dir
         self.data_url = data_url
         self.data_dir = data_dir
@@ -78,30 +162,37 @@ class Loader:
         logger.info("Initialized loader")
 
         self.header_splitter = MarkdownHeaderTextSplitter(
-            headers_to_split_on=[("#", "h1"), ("##", "h2"), ("###", "h3")]
-        )
-        self.leaf_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-            chunk_size=CHUNK_SIZE.get(self.language, 350),
-            chunk_overlap=CHUNK_OVERLAP.get(self.language, 50),
-            encoding_name="cl100k_base",
-            separators=["\n\n", "\n", " ", ""],
+            headers_to_split_on=list(MARKDOWN_HEADERS)
         )
-        self.generic_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-            chunk_size=CHUNK_SIZE.get(self.language, 350),
-            chunk_overlap=CHUNK_OVERLAP.get(self.language, 50),
-            encoding_name="cl100k_base",
-            separators=["\n\n", "\n", " ", ""],
+        self.leaf_splitter = _get_text_splitter(self.language)
+        self.generic_splitter = self.leaf_splitter
+
+    def _check_embeddings_model(self):
+        """
+        Ensure the collection was built with the configured embeddings model.
+
+        Vectors from different models have different dimensions and spaces, so
+        mixing them in one collection would break retrieval.
+
+        Raises:
+            ValueError: if the collection was built with another model.
+        """
+        stored_model = (self.vectorstore._collection.metadata or {}).get(
+            "embeddings_model"
         )
+        if stored_model and stored_model != get_embeddings_model_name():
+            raise ValueError(
+                f"Collection was built with embeddings model '{stored_model}' but "
+                f"'{get_embeddings_model_name()}' is configured; rebuild the "
+                "vector store or use a different collection"
+            )
 
     def _list_bucket_files(self) -> list[str]:
         """
         List all files in the S3 Bucket.
         """
         try:
-            response = requests.get(
-                f"{self.data_url}/rag-list-docs",
-                timeout=10,
-            )
+            response = _download(f"{self.data_url}/rag-list-docs")
             response.raise_for_status()
             data = response.json()
             return data.get("files", [])
@@ -109,9 +200,64 @@ class Loader:
             logger.error("Error listing bucket files: %s", str(e))
             return []
 
+    def _load_hash_index(self) -> set[str]:
+        """
+        Read the content hashes of every chunk already in the collection.
+
+        Chunks stored before `HASH_ALGORITHM` was introduced carry SHA-256
+        hashes and no `hash_algo` field; those are collected into
+        `_legacy_hash_index` so they are still recognized as duplicates. The
+        ETags of downloaded sources are collected into `_etags` along the way.
+
+        Returns:
+            Set of stored content and core hashes
+        """
+        index: set[str] = set()
+        self._legacy_hash_index = set()
+        self._etags = {}
+        offset = 0
+        while True:
+            results = self.vectorstore.get(
+                include=["metadatas"], limit=HASH_INDEX_PAGE_SIZE, offset=offset
+            )
+            metadatas = (results or {}).get("metadatas") or []
+            for metadata in metadatas:
+                if not metadata or "content_hash" not in metadata:
+                    continue
+                if metadata.get("etag"):
+                    self._etags[metadata["source"]] = metadata["etag"]
+                if metadata.get("hash_algo") == HASH_ALGORITHM:
+                    index.add(metadata["content_hash"])
+                    if metadata.get("core_hash"):
+                        index.add(metadata["core_hash"])
+                else:
+                    self._legacy_hash_index.add(metadata["content_hash"])
+            if len(metadatas) < HASH_INDEX_PAGE_SIZE:
+                return index
+            offset += HASH_INDEX_PAGE_SIZE
+
+    def _ensure_hash_index(self):
+        """Load the hash index and the ETags on first use."""
+        with self._hash_lock:
+            if self._hash_index is None:
+                self._hash_index = self._load_hash_index()
+
     def _check_duplicates(self, chunks: list[Document]) -> list[Document]:
         """
-        Check for duplicate chunks in the vector store.
+        Check for duplicate chunks in the vector store and within the batch.
+
+        Both the full text and its core (the text without the edges that
+        overlap with the neighbouring chunks) are hashed. A chunk is a
+        duplicate when either hash is known, so chunks whose boundaries moved
+        within the overlap after a minor edit are not indexed again. Only
+        edges shared with a neighbouring chunk of the same source, page and
+        section are trimmed, and chunks too short to keep a substantial core
+        get no core hash.
+
+        Hashes are tested against the in-memory index, so no vector store
+        query is issued. The hashes of the returned chunks are reserved in the
+        index; callers must release them with `_release_hashes` if storing
+        the chunks fails.
 
         Args:
             chunks: List of chunks to check for duplicates
@@ -119,75 +265,265 @@ class Loader:
         Returns:
             List of chunks that are not duplicates
         """
+        self._ensure_hash_index()
+        texts = [chunk.page_content for chunk in chunks]
+        hashes = self._compute_hashes(texts)
+        segments = [self._segment_key(chunk) for chunk in chunks]
+        cores = [
+            self._core_text(
+                text,
+                trim_start=index > 0 and segments[index - 1] == segment,
+                trim_end=index + 1 < len(chunks) and segments[index + 1] == segment,
+            )
+            for index, (text, segment) in enumerate(zip(texts, segments))
+        ]
+        core_digests = iter(
+            self._compute_hashes([core for core in cores if core is not None])
+        )
+        core_hashes = [
+            next(core_digests) if core is not None else None for core in cores
+        ]
+        legacy_hashes = (
+            self._compute_legacy_hashes(texts)
+            if self._legacy_hash_index
+            else [None] * len(texts)
+        )
+
         store_chunks = []
-        for chunk in chunks:
-            content_hash = self._compute_hash(chunk.page_content)
-            chunk.metadata["content_hash"] = content_hash
+        with self._hash_lock:
+            for chunk, content_hash, core_hash, legacy_hash in zip(
+                chunks, hashes, core_hashes, legacy_hashes
+            ):
+                chunk.metadata["content_hash"] = content_hash
+                chunk.metadata["hash_algo"] = HASH_ALGORITHM
+                if core_hash:
+                    chunk.metadata["core_hash"] = core_hash
+                if (
+                    content_hash in self._hash_index
+                    or core_hash in self._hash_index
+                    or legacy_hash in self._legacy_hash_index
+                ):
+                    continue
+
+                self._hash_index.add(content_hash)
+                if core_hash:
+                    self._hash_index.add(core_hash)
+                store_chunks.append(chunk)
+
+        skipped = len(chunks) - len(store_chunks)
+        if skipped:
+            logger.info("Skipping %d duplicate chunks", skipped)
 
-            results = self.vectorstore.get(where={"content_hash": content_hash})
+        return store_chunks
 
-            if results and results.get("documents"):
-                logger.info("Skipping duplicate chunk")
-                continue
+    def _release_hashes(self, chunks: list[Document]):
+        """Remove the hashes of chunks that could not be stored from the index."""
+        with self._hash_lock:
+            for chunk in chunks:
+                self._hash_index.discard(chunk.metadata["content_hash"])
+                self._hash_index.discard(chunk.metadata.get("core_hash"))
 
-            store_chunks.append(chunk)
+    @staticmethod
+    def _segment_key(chunk: Document) -> tuple:
+        """
+        Identify the text a chunk was split from; only consecutive chunks of
+        the same segment overlap.
+        """
+        metadata = chunk.metadata
+        return (
+            metadata.get("source"),
+            metadata.get("page"),
+            metadata.get("section_path"),
+        )
 
-        return store_chunks
+    def _core_text(
+        self, text: str, trim_start: bool = True, trim_end: bool = True
+    ) -> Optional[str]:
+        """
+        Return the text without the edges that overlap with the neighbouring
+        chunks, or None when nothing is trimmed or the chunk is too short for
+        its core to be a substantial part of it.
+        """
+        trim = CHUNK_OVERLAP.get(self.language, 50) * CHARS_PER_TOKEN
+        if not (trim_start or trim_end) or len(text) < 4 * trim:
+            return None
+        start = trim if trim_start else 0
+        end = len(text) - trim if trim_end else len(text)
+        return text[start:end]
 
-    def _compute_hash(self, text: str) -> str:
+    def _compute_hashes(self, texts: list[str]) -> list[str]:
         """
-        Compute a SHA-256 hash of the given text.
+        Compute the content hashes of a batch of texts.
+
+        BLAKE2b is faster than SHA-256 in software, and a 128-bit digest is
+        ample for deduplication while halving the hash stored per chunk.
 
         Args:
-            text: Text to hash
+            texts: Texts to hash
 
         Returns:
-            SHA-256 hash of the text
+            Hex digests of the texts, in the same order
         """
-        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+        blake2b = functools.partial(hashlib.blake2b, digest_size=16)
+        payloads = [text.encode("utf-8") for text in texts]
+        return [blake2b(payload).hexdigest() for payload in payloads]
+
+    def _compute_legacy_hashes(self, texts: list[str]) -> list[str]:
+        """Compute the SHA-256 hashes used by chunks stored without `hash_algo`."""
+        sha256 = hashlib.sha256
+        return [sha256(text.encode("utf-8")).hexdigest() for text in texts]
+
+    def _load_pdf(
+        self, source: str | bytes, metadata: dict[str, Any]
+    ) -> list[Document]:
+        """
+        Build one Document per non-empty PDF page.
+
+        Pages are split independently, so the whole text of the PDF is never
+        joined into a single string. Blank pages (e.g. scans or image-only
+        pages) are dropped before splitting. PDFs with more than
+        `PARALLEL_PDF_MIN_PAGES` pages are extracted in page ranges by a pool
+        of worker processes; smaller ones are not worth the transfer cost.
+
+        Args:
+            source: Path of the PDF file, or its raw content
+            metadata: Metadata shared by all pages
 
-    def load_from_url(self, url: str) -> Optional[Document]:
+        Returns:
+            List of page Documents with a `page` metadata field
         """
-        Load a single document (pdf, txt or markdown) from a URL.
+        # PyMuPDF is only loaded once a PDF is actually ingested
+        import fitz
+
+        if isinstance(source, bytes):
+            doc = fitz.open(stream=source, filetype="pdf")
+        else:
+            doc = fitz.open(source)
+
+        with doc:
+            page_count = doc.page_count
+            if page_count <= PARALLEL_PDF_MIN_PAGES:
+                pages = [(page.number, page.get_text("text")) for page in doc]
+
+        if page_count > PARALLEL_PDF_MIN_PAGES:
+            # Imported here as well: `pdf` imports PyMuPDF at module level
+            from .pdf import extract_page_texts
+
+            step = -(-page_count // PDF_WORKERS)
+            starts = range(0, page_count, step)
+            stops = [min(start + step, page_count) for start in starts]
+            pages = [
+                page
+                for page_range in _get_pdf_executor().map(
+                    extract_page_texts, [source] * len(starts), starts, stops
+                )
+                for page in page_range
+            ]
+
+        return [
+            Document(page_content=text, metadata={**metadata, "page": number})
+            for number, text in pages
+            if text and not text.isspace()
+        ]
+
+    def _fetch(self, url: str) -> Optional[tuple[bytes, str, str]]:
+        """
+        Download a document from a URL.
+
+        When the document was stored before with an ETag, the request is made
+        conditional, so an unchanged file is neither downloaded nor parsed.
 
         Args:
-            url: URL of the document to load
+            url: URL of the document to download
 
         Returns:
-            Document object
+            Tuple with the raw content, the response Content-Type and ETag, or
+            None if the document has not been modified
         """
-        response = requests.get(url, timeout=10)
+        self._ensure_hash_index()
+        etag = self._etags.get(url)
+        headers = {"If-None-Match": etag} if etag else None
+
+        response = _download(url, headers=headers)
+        if response.status_code == httpx.codes.NOT_MODIFIED:
+            logger.info("Document not modified, skipping: %s", url)
+            return None
+
         response.raise_for_status()
-        content_bytes = response.content
+        return (
+            response.content,
+            response.headers.get("Content-Type", ""),
+            response.headers.get("ETag", ""),
+        )
 
+    def _safe_fetch(self, url: str) -> Optional[tuple[bytes, str, str]]:
+        """Download a document from a URL, logging and skipping failures."""
+        try:
+            return self._fetch(url)
+        except Exception as e:
+            logger.error("Failed to download file %s: %s", url, e)
+            return None
+
+    def _parse_download(
+        self, url: str, content_bytes: bytes, content_type: str, etag: str
+    ) -> list[Document]:
+        """
+        Build the Documents (pdf, txt or markdown) from downloaded content.
+
+        Args:
+            url: URL the content was downloaded from
+            content_bytes: Raw document content
+            content_type: Content-Type header of the response
+            etag: ETag header of the response (may be empty), stored with
+                the chunks
+
+        Returns:
+            List of Documents (one per page for PDFs), empty if the file type
+            is not supported
+        """
         filename = os.path.basename(url).split("?")[0]
         if not filename or filename == "/":
             filename = f"document_{int(time.time())}"
 
         file_ext = Path(filename).suffix.lower()
         if not file_ext:
-            content_type = response.headers.get("Content-Type", "")
             file_ext = mimetypes.guess_extension(content_type) or ".txt"
 
-        if file_ext not in [".txt", ".md", ".pdf"]:
-            logger.error(f"Unsupported file type: {file_ext}")
-            return None
+        if file_ext not in ALLOWED_EXTENSIONS:
+            logger.error("Unsupported file type: %s", file_ext)
+            return []
 
-        if file_ext in [".txt", ".md"]:
-            content = content_bytes.decode("utf-8")
-        else:
-            with fitz.open(stream=content_bytes, filetype="pdf") as doc:
-                content = "\n\n".join([page.get_text() for page in doc])
-
-        return Document(
-            page_content=content,
-            metadata={
-                "source": url,
-                "file_type": file_ext,
-                "filename": filename,
-                "lang_hint": self.language,
-            },
-        )
+        metadata = {
+            "source": url,
+            "file_type": file_ext,
+            "filename": filename,
+            "lang_hint": self.language,
+        }
+        if etag:
+            metadata["etag"] = etag
+
+        if file_ext in TEXT_EXTENSIONS:
+            return [
+                Document(page_content=content_bytes.decode("utf-8"), metadata=metadata)
+            ]
+
+        return self._load_pdf(content_bytes, metadata)
+
+    def load_from_url(self, url: str) -> Optional[list[Document]]:
+        """
+        Load a single document (pdf, txt or markdown) from a URL.
+
+        Args:
+            url: URL of the document to load
+
+        Returns:
+            List of Documents (one per page for PDFs), or None if the file
+            type is not supported or the file has not been modified
+        """
+        download = self._fetch(url)
+        if download is None:
+            return None
+        return self._parse_download(url, *download) or None
 
     def _split_markdown(self, doc: Document) -> list[Document]:
         """
@@ -200,49 +536,37 @@ class Loader:
 
         for sec in sections:
             path_parts = [
-                sec.metadata.get(h) for h in ("h1", "h2", "h3") if sec.metadata.get(h)
+                sec.metadata.get(h) for h in HEADER_LEVELS if sec.metadata.get(h)
             ]
             section_path = " > ".join(path_parts) if path_parts else None
 
-            leaves = self.leaf_splitter.split_text(sec.page_content)
+            leaves = self.leaf_splitter.chunks(sec.page_content)
+            # Merge once per section; each leaf gets a shallow copy because
+            # _check_duplicates stores a per-chunk content hash in it.
+            base_meta = {**doc.metadata, **sec.metadata, "section_path": section_path}
+            prefix = f"[{section_path}]\n\n" if section_path else ""
 
             for leaf in leaves:
-                content = f"[{section_path}]\n\n{leaf}" if section_path else leaf
                 split_docs.append(
-                    Document(
-                        page_content=content,
-                        metadata={
-                            **doc.metadata,
-                            **sec.metadata,
-                            "section_path": section_path,
-                        },
-                    )
+                    Document(page_content=prefix + leaf, metadata=base_meta.copy())
                 )
 
         if not split_docs:
-            return [
-                Document(
-                    page_content=chunk,
-                    metadata={
-                        **doc.metadata,
-                        "breadcrumbs": None,
-                        "section_path": None,
-                    },
-                )
-                for chunk in self.leaf_splitter.split_text(doc.page_content)
-            ]
+            return self._split_plain(doc, self.leaf_splitter)
         return split_docs
 
     def _split_generic(self, doc: Document) -> list[Document]:
         """
         Recursive split for txt/pdf or anything non-markdown.
         """
+        return self._split_plain(doc, self.generic_splitter)
+
+    def _split_plain(self, doc: Document, splitter: TextSplitter) -> list[Document]:
+        """Split a Document without section metadata."""
+        base_meta = {**doc.metadata, "breadcrumbs": None, "section_path": None}
         return [
-            Document(
-                page_content=chunk,
-                metadata={**doc.metadata, "breadcrumbs": None, "section_path": None},
-            )
-            for chunk in self.generic_splitter.split_text(doc.page_content)
+            Document(page_content=chunk, metadata=base_meta.copy())
+            for chunk in splitter.chunks(doc.page_content)
         ]
 
     def _filter_by_lang(self, files: list[str]) -> list[str]:
@@ -258,12 +582,13 @@ class Loader:
 
         return filtered_files
 
-    def _load_from_s3(self) -> Optional[list[Document]]:
+    def _download_from_s3(self) -> list[tuple[str, tuple[bytes, str, str]]]:
         """
-        Load all .txt, .md, and .pdf files from the cloud data directory.
+        Download all files of this language listed in the bucket.
 
         Returns:
-            List of loaded documents, or None if directory doesn't exist or is empty
+            List of (url, (content, content_type, etag)) for the files that
+            were downloaded; failed and unmodified files are left out
         """
 
         list_files = self._list_bucket_files()
@@ -274,19 +599,44 @@ class Loader:
             logger.warning(
                 "No files found in Bucket matching the language: %s", self.language
             )
-            return None
+            return []
+
+        urls = [f"{CDN_URL}/{filename}" for filename in filtered_files]
+        logger.info("Downloading %d files from the CDN", len(urls))
+
+        # Downloads are I/O bound and run concurrently; parsing is left to the
+        # caller's thread because PyMuPDF does not support multithreaded use.
+        with ThreadPoolExecutor(
+            max_workers=min(DOWNLOAD_WORKERS, len(urls))
+        ) as executor:
+            downloads = list(executor.map(self._safe_fetch, urls))
+
+        return [
+            (url, download)
+            for url, download in zip(urls, downloads)
+            if download is not None
+        ]
 
+    def _parse_downloads(
+        self, downloads: list[tuple[str, tuple[bytes, str, str]]]
+    ) -> list[Document]:
+        """Parse downloaded files into Documents, skipping unsupported ones."""
         documents: list[Document] = []
 
-        for filename in filtered_files:
-            file = f"{CDN_URL}/{filename}"
-            logger.info("Loading file from URL: %s", file)
-            doc = self.load_from_url(file)
+        for url, download in downloads:
+            logger.info("Loading file from URL: %s", url)
+            documents.extend(self._parse_download(url, *download))
 
-            if doc:
-                documents.append(doc)
+        return documents
 
-        return documents or None
+    def _load_from_s3(self) -> Optional[list[Document]]:
+        """
+        Load all .txt, .md, and .pdf files from the cloud data directory.
+
+        Returns:
+            List of loaded documents, or None if directory doesn't exist or is empty
+        """
+        return self._parse_downloads(self._download_from_s3()) or None
 
     def _load_from_disk(self) -> Optional[list[Document]]:
         """
@@ -306,7 +656,7 @@ class Loader:
         all_files = [
             str(file_path)
             for file_path in docs_path.rglob("*")
-            if file_path.suffix.lower() in [".md", ".txt", ".pdf"]
+            if file_path.suffix.lower() in ALLOWED_EXTENSIONS
         ]
 
         filtered_files = self._filter_by_lang(all_files)
@@ -323,24 +673,19 @@ class Loader:
             file_path = Path(file_path)
             logger.info("Loading file from disk: %s", file_path)
 
+            metadata = {
+                "source": str(file_path),
+                "file_type": file_path.suffix.lower(),
+                "filename": file_path.name,
+                "lang_hint": self.language,
+            }
+
             try:
-                if file_path.suffix.lower() in [".txt", ".md"]:
+                if file_path.suffix.lower() in TEXT_EXTENSIONS:
                     content = file_path.read_text(encoding="utf-8")
+                    documents.append(Document(page_content=content, metadata=metadata))
                 else:
-                    with fitz.open(file_path) as doc:
-                        content = "\n\n".join([page.get_text() for page in doc])
-
-                documents.append(
-                    Document(
-                        page_content=content,
-                        metadata={
-                            "source": str(file_path),
-                            "file_type": file_path.suffix.lower(),
-                            "filename": file_path.name,
-                            "lang_hint": self.language,
-                        },
-                    )
-                )
+                    documents.extend(self._load_pdf(str(file_path), metadata))
             except Exception as e:
                 logger.error("Failed to load file %s: %s", file_path, e)
 
@@ -355,11 +700,13 @@ class Loader:
             exist or is empty
         """
 
-        documents: list[Document] = self._load_from_disk() or []
-
-        s3_docs = self._load_from_s3()
-        if s3_docs:
-            documents.extend(s3_docs)
+        # The bucket downloads run in the background while the local files
+        # are read; all PDF parsing stays on this thread (PyMuPDF is not
+        # thread-safe).
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            downloads = executor.submit(self._download_from_s3)
+            documents: list[Document] = self._load_from_disk() or []
+            documents.extend(self._parse_downloads(downloads.result()))
 
         return documents or None
 
@@ -374,7 +721,124 @@ class Loader:
                 chunks.extend(self._split_markdown(doc))
             else:
                 chunks.extend(self._split_generic(doc))
-        return chunks
+        return self._merge_small_chunks(chunks)
+
+    def _merge_small_chunks(self, chunks: list[Document]) -> list[Document]:
+        """
+        Merge chunks shorter than `MIN_CHUNK_TOKENS` into the preceding chunk
+        of the same segment (source, page and section), as long as the result,
+        separator included, stays within the chunk size.
+
+        Short chunks (a heading with one line, the tail of a section) waste
+        retrieval slots; since both come from the same segment, the metadata
+        of the first one still describes the merged chunk.
+        """
+        max_tokens = CHUNK_SIZE.get(self.language, 350)
+        separator = "\n\n"
+        separator_tokens = count_tokens(separator, TOKENIZER_MODEL)
+        merged: list[Document] = []
+        previous_tokens = 0
+
+        for chunk in chunks:
+            tokens = count_tokens(chunk.page_content, TOKENIZER_MODEL)
+            if (
+                merged
+                and min(tokens, previous_tokens) < MIN_CHUNK_TOKENS
+                and previous_tokens + separator_tokens + tokens <= max_tokens
+                and self._segment_key(merged[-1]) == self._segment_key(chunk)
+            ):
+                merged[-1].page_content += separator + chunk.page_content
+                previous_tokens += separator_tokens + tokens
+                continue
+
+            merged.append(chunk)
+            previous_tokens = tokens
+
+        return merged
+
+    def _find_near_duplicates(self, vectors: list[list[float]]) -> list[bool]:
+        """
+        Flag vectors whose nearest stored chunk has a cosine similarity of at
+        least `NEAR_DUPLICATE_THRESHOLD`.
+
+        All vectors are looked up with a single collection query, reusing the
+        embeddings computed for the insert.
+
+        Args:
+            vectors: Embeddings of the chunks about to be stored
+
+        Returns:
+            One flag per vector, True for near-duplicates
+        """
+        if not self.vectorstore._collection.count():
+            return [False] * len(vectors)
+
+        results = self.vectorstore._collection.query(
+            query_embeddings=vectors, n_results=1, include=["embeddings"]
+        )
+        queries = np.asarray(vectors, dtype=np.float32)
+        nearest = np.vstack(
+            [np.asarray(match, dtype=np.float32)[:1] for match in results["embeddings"]]
+        )
+        similarities = np.einsum("ij,ij->i", queries, nearest) / (
+            np.linalg.norm(queries, axis=1) * np.linalg.norm(nearest, axis=1)
+        )
+        return (similarities >= NEAR_DUPLICATE_THRESHOLD).tolist()
+
+    def _add_chunks(self, chunks: list[Document]) -> list[str]:
+        """
+        Embed and store chunks in batches of `EMBEDDINGS_BATCH_SIZE`.
+
+        Up to `EMBEDDINGS_WORKERS` batches are embedded concurrently, each with
+        a single `embed_documents` request, while finished batches are written
+        to the collection in order together with their precomputed vectors.
+        Chunks that are near-duplicates of a stored chunk are not written.
+
+        Args:
+            chunks: List of chunks to add to the vector store
+
+        Returns:
+            IDs of the added chunks
+        """
+        batches = [
+            chunks[start : start + EMBEDDINGS_BATCH_SIZE]
+            for start in range(0, len(chunks), EMBEDDINGS_BATCH_SIZE)
+        ]
+        if not batches:
+            return []
+
+        texts = [[chunk.page_content for chunk in batch] for batch in batches]
+
+        ids: list[str] = []
+        skipped = 0
+        with ThreadPoolExecutor(
+            max_workers=min(EMBEDDINGS_WORKERS, len(batches))
+        ) as executor:
+            vectors = executor.map(self.embeddings.embed_documents, texts)
+            for batch, batch_texts, batch_vectors in zip(batches, texts, vectors):
+                near_duplicates = self._find_near_duplicates(batch_vectors)
+                keep = [
+                    index
+                    for index, duplicate in enumerate(near_duplicates)
+                    if not duplicate
+                ]
+                skipped += len(batch) - len(keep)
+                if not keep:
+                    continue
+
+                batch_ids = [str(uuid.uuid4()) for _ in keep]
+                self.vectorstore._collection.upsert(
+                    ids=batch_ids,
+                    embeddings=[batch_vectors[index] for index in keep],
+                    documents=[batch_texts[index] for index in keep],
+                    metadatas=[batch[index].metadata for index in keep],
+                )
+                ids.extend(batch_ids)
+
+        if skipped:
+            logger.info("Skipping %d near-duplicate chunks", skipped)
+
+        return ids
 
     def build_vectorstore(self, documents: list[Document]):
         """
@@ -388,12 +852,20 @@ class Loader:
         store_chunks = self._check_duplicates(chunks)
 
         if store_chunks:
-            ids = self.vectorstore.add_documents(store_chunks)
+            try:
+                ids = self._add_chunks(store_chunks)
+            except Exception:
+                self._release_hashes(store_chunks)
+                raise
             self.ids.extend(ids)
             logger.info("Added new documents to vector store")
         else:
             logger.info("No new chunks to add to vector store")
 
+        for document in documents:
+            if document.metadata.get("etag"):
+                self._etags[document.metadata["source"]] = document.metadata["etag"]
+
     def add_from_url(self, url: str) -> Optional[str]:
         """
         Add a document from a URL to the vector store.
@@ -404,18 +876,27 @@ class Loader:
         Returns:
             Metadata of the added document
         """
-        document = self.load_from_url(url)
-        if document:
-            self.build_vectorstore([document])
-            return document.metadata["source"]
+        documents = self.load_from_url(url)
+        if documents:
+            self.build_vectorstore(documents)
+            return documents[0].metadata["source"]
         else:
-            logger.error("Failed to load document from URL: %s", url)
+            logger.warning("No new document loaded from URL: %s", url)
             return None
 
     def init_vectorstore(self):
         """
         Initialize the vectorstore at the start of the application.
+
+        A persisted collection that already holds vectors is reused as is,
+        unless `FORCE_REINDEX` is set.
         """
+        if not FORCE_REINDEX:
+            count = self.vectorstore._collection.count()
+            if count > 0:
+                logger.info("Reusing persisted collection (%d vectors)", count)
+                return self.vectorstore
+
         documents = self.load_documents()
         if documents:
             logger.info("Building vector store with loaded documents")
@@ -0,0 +1,28 @@
+import fitz
+
+
+def extract_page_texts(
+    source: str | bytes, start: int, stop: int
+) -> list[tuple[int, str]]:
+    """
+    Extract the plain text of a range of PDF pages.
+
+    Runs in a worker process: PyMuPDF is not thread-safe, so large PDFs are
+    split into page ranges that each process opens on its own. This module
+    only imports PyMuPDF to keep worker start-up cheap.
+
+    Args:
+        source: Path of the PDF file, or its raw content
+        start: First page number (inclusive)
+        stop: Last page number (exclusive)
+
+    Returns:
+        List of (page number, text) tuples
+    """
+    if isinstance(source, bytes):
+        doc = fitz.open(stream=source, filetype="pdf")
+    else:
+        doc = fitz.open(source)
+
+    with doc:
+        return [(number, doc[number].get_text("text")) for number in range(start, stop)]
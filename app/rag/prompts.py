@@ -1,5 +1,12 @@
-HISTORY_PROMPTS = {
-    "en": """
+import re
+import textwrap
+from types import MappingProxyType
+
+from langchain.prompts import PromptTemplate
+
+HISTORY_PROMPTS = MappingProxyType(
+    {
+        "en": """
         Given the conversation history and the latest user question, rewrite the
         question to be a standalone query that can be understood without the history.
 
@@ -22,7 +29,7 @@ HISTORY_PROMPTS = {
 
         Rewritten Question:
         """,
-    "es": """
+        "es": """
         Dada la historia de la conversación y la última pregunta del usuario, reescribe
         la pregunta para que sea una consulta independiente que se pueda entender sin el
         historial.
@@ -47,10 +54,14 @@ HISTORY_PROMPTS = {
 
         Pregunta Reescrita:
         """,
-}
-
-PROMPT_TEMPLATES = {
-    "en": """
+    }
+)
+
+# The answer prompts keep the static instructions and the context first and
+# the volatile date and question last, so providers can cache the prefix.
+PROMPT_TEMPLATES = MappingProxyType(
+    {
+        "en": """
         You are Luis's personal AI assistant: friendly, professional, and approachable.
         You must not reffer yourself as an assistan, you must act as Luis.
         Speak in the first person ("I", "my", "me").
@@ -61,11 +72,11 @@ PROMPT_TEMPLATES = {
         - Use a clear and warm tone with occasional natural emojis ✨ (never spammy).
 
         ### Time Context
-        - **Today's Date**: {date}
-        - Use this date to correctly interpret "past" vs "future".
-        - **CRITICAL**: If a document mentions an event with a date BEFORE {date}, refer
+        - Use today's date (given after the context) to correctly interpret "past" vs
+          "future".
+        - **CRITICAL**: If a document mentions an event with a date BEFORE today, refer
           to it in the **PAST TENSE**.
-        - If a document mentions an event with a date AFTER {date}, refer to it in the
+        - If a document mentions an event with a date AFTER today, refer to it in the
           **FUTURE TENSE**.
 
         ### Instructions
@@ -79,12 +90,15 @@ PROMPT_TEMPLATES = {
         ### Context
         {context}
 
+        ### Today's Date
+        {date}
+
         ### User Question
         {input}
 
         ### Your Answer (as Luis)
         """,
-    "es": """
+        "es": """
         Eres la versión IA de **Luis**. No eres un asistente; **ERES** Luis.
         Habla en primera persona ("yo", "mi", "me").
 
@@ -94,11 +108,11 @@ PROMPT_TEMPLATES = {
         - Sé conciso pero útil.
 
         ### Contexto Temporal
-        - **Fecha de Hoy**: {date}
-        - Usa esta fecha para interpretar correctamente "pasado" vs "futuro".
+        - Usa la fecha de hoy (indicada después del contexto) para interpretar
+          correctamente "pasado" vs "futuro".
         - **CRÍTICO**: Si un documento menciona un evento con una fecha ANTERIOR a
-          {date}, refiérete a él en **TIEMPO PASADO**.
-        - Si un documento menciona un evento con una fecha POSTERIOR a {date},
+          hoy, refiérete a él en **TIEMPO PASADO**.
+        - Si un documento menciona un evento con una fecha POSTERIOR a hoy,
           refiérete a él en **TIEMPO FUTURO**.
 
         ### Instrucciones
@@ -112,9 +126,39 @@ PROMPT_TEMPLATES = {
         ### Contexto
         {context}
 
+        ### Fecha de Hoy
+        {date}
+
         ### Pregunta del Usuario
         {input}
 
         ### Tu Respuesta (como Luis)
         """,
-}
+    }
+)
+
+
+def compact_prompt(template: str) -> str:
+    """
+    Strip the source indentation, trailing spaces and extra blank lines from a
+    template, which would otherwise be sent (and billed) on every LLM call.
+    """
+    text = textwrap.dedent(template).strip()
+    text = re.sub(r"[ \t]+\n", "\n", text)
+    return re.sub(r"\n{3,}", "\n\n", text)
+
+
+# Compacted and parsed once at import; the templates are fixed per language.
+# The maps are read-only, so every pipeline (and thread) shares them safely.
+HISTORY_PROMPT_TEMPLATES = MappingProxyType(
+    {
+        language: PromptTemplate.from_template(compact_prompt(template))
+        for language, template in HISTORY_PROMPTS.items()
+    }
+)
+ANSWER_PROMPT_TEMPLATES = MappingProxyType(
+    {
+        language: PromptTemplate.from_template(compact_prompt(template))
+        for language, template in PROMPT_TEMPLATES.items()
+    }
+)
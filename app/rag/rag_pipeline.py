@@ -1,19 +1,71 @@
+import asyncio
+import hashlib
 import logging
-from datetime import datetime
-from typing import Any, TypedDict
+import re
+from datetime import date
+from typing import TYPE_CHECKING, Any, AsyncIterator, TypedDict
 
+import numpy as np
+from cachetools import LRUCache
 from langchain.prompts import PromptTemplate
-from langchain_community.vectorstores import Chroma
-from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_core.documents import Document
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    HumanMessage,
+)
+from langchain_core.runnables import Runnable
+from langchain_openai import ChatOpenAI
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.checkpoint.memory import MemorySaver
-from langgraph.graph import START, StateGraph
-
-from .prompts import HISTORY_PROMPTS, PROMPT_TEMPLATES
-from .settings import EMBEDDINGS_MODEL, LLM_MODEL, TEMPERATURE
+from langgraph.graph import END, START, StateGraph
+
+from .cache import ResponseCache
+from .embeddings import get_embeddings
+from .http import get_async_http_client, get_http_client
+from .prompts import ANSWER_PROMPT_TEMPLATES, HISTORY_PROMPT_TEMPLATES
+from .reranker import rerank
+from .settings import (
+    CACHE_MAXSIZE,
+    CACHE_SIMILARITY_THRESHOLD,
+    CACHE_TTL,
+    LLM_MODEL,
+    MAX_CONTEXT_TOKENS,
+    MAX_HISTORY_TURNS,
+    QUERY_EMBEDDINGS_CACHE_SIZE,
+    RERANK_TOP_N,
+    RERANKER_MODEL,
+    SPECULATIVE_RETRIEVAL_THRESHOLD,
+    TEMPERATURE,
+)
+from .tokens import count_tokens
+
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
 
 logger = logging.getLogger(__name__)
 
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+
+def _cosine_similarity(a: list[float], b: list[float]) -> float:
+    """Cosine similarity of two vectors."""
+    a_array = np.asarray(a, dtype=np.float32)
+    b_array = np.asarray(b, dtype=np.float32)
+    norm = np.linalg.norm(a_array) * np.linalg.norm(b_array)
+    return float(a_array @ b_array / norm) if norm else 0.0
+
+
+def _document_key(document: Any) -> str:
+    """Stable identifier of a chunk: its content hash, or one computed here."""
+    content_hash = document.metadata.get("content_hash")
+    if content_hash:
+        return content_hash
+    return hashlib.blake2b(
+        document.page_content.encode("utf-8"), digest_size=16
+    ).hexdigest()
+
 
 class GraphState(TypedDict):
     """
@@ -22,9 +74,11 @@ class GraphState(TypedDict):
     Attributes:
         question: Original user question
         rewritten_question: Context-aware rewritten question (optional)
-        documents: Retrieved documents from vectorstore
+        documents: Retrieved documents from vectorstore, cleared before the
+            state is checkpointed
         answer: Generated answer (optional)
-        messages: Full conversation history for persistence and context
+        messages: Last `MAX_HISTORY_TURNS` turns of the conversation, for
+            persistence and context
     """
 
     question: str
@@ -43,13 +97,20 @@ class RAGPipeline:
     Constructor:
         model_name: LLM model name (defaults to value from settings).
         temperature: LLM temperature.
-        vectorstore: Initialized `Chroma` vector store (required).
+        vectorstore: Initialized `Chroma` vector store (required), shared
+            with the `Loader` that populates it.
         language: Pipeline language, e.g. "en" or "es".
+        checkpointer: Conversation state saver (in memory by default).
 
     Main methods:
-        generate_answer(question, thread_id) -> dict with keys:
+        await generate_answer(question, thread_id) -> dict with keys:
             - answer: generated answer string
             - sources: list of source documents with 'content' and 'metadata'
+        clear_cache() -> drops every cached answer (call after ingesting data).
+
+    Answers are cached per standalone (rewritten) question, both exactly (up
+    to case and whitespace) and by embedding similarity, so repeated
+    questions skip retrieval and the LLM.
 
     Raises:
         ValueError: if `vectorstore` is not provided to the constructor.
@@ -59,8 +120,9 @@ class RAGPipeline:
         self,
         model_name: str = LLM_MODEL,
         temperature: float = TEMPERATURE,
-        vectorstore: Chroma = None,
+        vectorstore: "Chroma" = None,
         language: str = "en",
+        checkpointer: BaseCheckpointSaver | None = None,
     ):
         """
         Initialize the RAG pipeline.
@@ -69,135 +131,371 @@ class RAGPipeline:
             model_name: Name of the OpenAI model to use
             temperature: Temperature parameter for the LLM
             language: Language for prompts ("en" or "es")
+            checkpointer: Saver for the conversation state (an in-memory
+                `MemorySaver` by default)
         """
         if vectorstore is None:
             raise ValueError("Vector store not initialized")
 
-        self.embeddings = OpenAIEmbeddings(model=EMBEDDINGS_MODEL)
+        self.embeddings = get_embeddings()
         self.vectorstore = vectorstore
-        self.llm = ChatOpenAI(model_name=model_name, temperature=temperature)
         self.language = language.lower()
+        # Requests sharing a cache key are routed together, which raises the
+        # provider's prompt-cache hit rate for the common prompt prefix.
+        self.llm = ChatOpenAI(
+            model_name=model_name,
+            temperature=temperature,
+            model_kwargs={"prompt_cache_key": f"personal-rag-{self.language}"},
+            http_client=get_http_client(),
+            http_async_client=get_async_http_client(),
+        )
 
+        # MMR picks 6 diverse chunks out of the 20 nearest, so overlapping
+        # neighbours of the same passage do not crowd out other context.
+        self.search_kwargs = {"k": 6, "fetch_k": 20, "lambda_mult": 0.5}
         self.retriever = self.vectorstore.as_retriever(
-            search_type="similarity", search_kwargs={"k": 6}
+            search_type="mmr", search_kwargs=self.search_kwargs
+        )
+        self.query_embeddings: LRUCache = LRUCache(maxsize=QUERY_EMBEDDINGS_CACHE_SIZE)
+
+        self.cache = ResponseCache(
+            maxsize=CACHE_MAXSIZE,
+            ttl=CACHE_TTL,
+            threshold=CACHE_SIMILARITY_THRESHOLD,
         )
 
-        self.graph = self._build_graph()
+        # Templates are resolved and chains composed once; the answer chain
+        # is rebuilt with the new date partial only when the day changes.
+        self.history_prompt = self.build_history_prompt()
+        self.answer_prompt = self.build_prompt()
+        self.rewrite_chain = self.history_prompt | self.llm
+        self._answer_chain: tuple[str, Runnable] | None = None
+
+        self.graph = self._build_graph(checkpointer or MemorySaver())
 
         logger.info("✅ Initialized RAG pipeline for language: %s", self.language)
 
     def build_history_prompt(self) -> PromptTemplate:
         """
-        Builds a history prompt template for the RAG pipeline.
+        Returns the precompiled history prompt template for the pipeline language.
 
         Returns:
             PromptTemplate: The history prompt template.
         """
-        template = HISTORY_PROMPTS.get(self.language, HISTORY_PROMPTS["en"])
-        return PromptTemplate.from_template(template)
+        return HISTORY_PROMPT_TEMPLATES.get(
+            self.language, HISTORY_PROMPT_TEMPLATES["en"]
+        )
 
     def build_prompt(self) -> PromptTemplate:
         """
-        Builds the main prompt template for the RAG pipeline.
+        Returns the precompiled main prompt template for the pipeline language.
 
         Returns:
             PromptTemplate: The main prompt template.
         """
-        template = PROMPT_TEMPLATES.get(self.language, PROMPT_TEMPLATES["en"])
-        return PromptTemplate.from_template(template)
+        return ANSWER_PROMPT_TEMPLATES.get(self.language, ANSWER_PROMPT_TEMPLATES["en"])
+
+    def get_answer_chain(self) -> Runnable:
+        """
+        Returns the answer chain with today's date filled in, reusing the one
+        built earlier the same day.
 
-    def _rewrite_question(self, state: GraphState) -> dict:
+        Returns:
+            Runnable: The answer prompt piped into the LLM.
+        """
+        today = date.today().isoformat()
+        if self._answer_chain is None or self._answer_chain[0] != today:
+            answer_prompt = self.answer_prompt.partial(date=today)
+            self._answer_chain = (today, answer_prompt | self.llm)
+        return self._answer_chain[1]
+
+    async def _rewrite_question(self, state: GraphState) -> dict:
         """
         Node that rewrites the user question with conversation history context.
+
+        While the rewrite LLM call runs, documents are speculatively retrieved
+        for the original question. They are kept when the rewritten question
+        embeds close enough to the original one, so retrieval is skipped.
         """
         question = state["question"]
         messages = state["messages"]
 
         if not messages:
             return {"rewritten_question": question}
-        history_prompt = self.build_history_prompt()
-        rewrite_chain = history_prompt | self.llm
+        speculative = asyncio.create_task(self._speculative_retrieval(question))
+        try:
+            response = await self.rewrite_chain.ainvoke(
+                {"input": question, "chat_history": self._format_history(messages)}
+            )
+            rewritten_question = response.content
+            logger.info("Question rewritten: %s", rewritten_question)
+
+            query_embedding = await self._embed_query(rewritten_question)
+            speculation = await speculative
+        finally:
+            # No-op once awaited; otherwise the retrieval must not outlive a
+            # failed rewrite or embedding
+            speculative.cancel()
+
+        if speculation is None:
+            return {"rewritten_question": rewritten_question}
+
+        original_embedding, documents = speculation
+        similarity = _cosine_similarity(original_embedding, query_embedding)
+        if similarity < SPECULATIVE_RETRIEVAL_THRESHOLD:
+            logger.info("Discarding speculative retrieval (%.3f)", similarity)
+            documents = []
+
+        return {"rewritten_question": rewritten_question, "documents": documents}
+
+    async def _speculative_retrieval(
+        self, question: str
+    ) -> tuple[list[float], list[Any]] | None:
+        """
+        Embed the original question and retrieve documents for it, or return
+        None if that fails (the regular retrieval then runs).
+        """
+        try:
+            embedding = await self._embed_query(question)
+            documents = await self._search(embedding)
+        except Exception:
+            logger.warning("Speculative retrieval failed", exc_info=True)
+            return None
+        return embedding, documents
+
+    async def _search(self, query_embedding: list[float]) -> list[Any]:
+        """
+        Retrieve documents for a question embedding with MMR.
+        """
+        return await self.vectorstore.amax_marginal_relevance_search_by_vector(
+            query_embedding, **self.search_kwargs
+        )
+
+    @staticmethod
+    def _format_history(messages: list[BaseMessage]) -> str:
+        """
+        Render the conversation as one "User: ..." / "Assistant: ..." line per
+        message, instead of the message objects' repr.
+        """
+        return "\n".join(
+            f"{'User' if isinstance(message, HumanMessage) else 'Assistant'}: "
+            f"{message.content}"
+            for message in messages
+        )
 
-        response = rewrite_chain.invoke({"input": question, "chat_history": messages})
+    async def _lookup_cache(self, state: GraphState) -> dict:
+        """
+        Node that looks up a cached answer for the rewritten question, first by
+        exact match and then by embedding similarity.
+        """
+        question = state["rewritten_question"]
+
+        cached = self.cache.get(self._question_key(question))
+        if cached is None:
+            cached = self.cache.get_similar(await self._embed_query(question))
 
-        rewritten_question = response.content
-        logger.info("Question rewritten: %s", rewritten_question)
+        if cached is None:
+            return {}
 
-        return {"rewritten_question": rewritten_question}
+        logger.info("Answer served from cache")
+        return {"answer": cached["answer"], "documents": cached["documents"]}
 
-    def _retrieve_documents(self, state: GraphState) -> dict:
+    async def _embed_query(self, question: str) -> list[float]:
         """
-        Node that retrieves documents using the rewritten question.
+        Embed a standalone question, reusing the vector of a question seen
+        before. Unlike cached answers, these stay valid when documents change.
+        Vectors live here rather than in the graph state, so checkpoints do
+        not persist one per turn.
         """
-        rewritten_question = state["rewritten_question"]
+        query_embedding = self.query_embeddings.get(question)
+        if query_embedding is None:
+            query_embedding = await self.embeddings.aembed_query(question)
+            self.query_embeddings[question] = query_embedding
+        return query_embedding
 
-        documents = self.retriever.invoke(rewritten_question)
-        logger.info("Retrieved %d documents", len(documents))
+    def _route_after_cache(self, state: GraphState) -> str:
+        """
+        Route to retrieval on a cache miss, or straight to the cached answer.
+        """
+        return "cached_answer" if state["answer"] else "retrieve_documents"
 
-        return {"documents": documents}
+    def _cached_answer(self, state: GraphState) -> dict:
+        """
+        Node that records a cached answer in the conversation history.
+        """
+        return {"messages": self._append_turn(state, state["answer"])}
 
-    def _final_answer(self, state: GraphState) -> dict:
+    def _append_turn(self, state: GraphState, answer: str) -> list[BaseMessage]:
         """
-        Node that generates the final answer using retrieved documents.
+        Return the conversation history with the current question and answer,
+        keeping only the last `MAX_HISTORY_TURNS` turns.
+        """
+        messages = state["messages"]
+        keep_from = max(0, len(messages) - 2 * (MAX_HISTORY_TURNS - 1))
+        return [
+            *messages[keep_from:],
+            HumanMessage(content=state["question"]),
+            AIMessage(content=answer),
+        ]
+
+    def _clear_documents(self, state: GraphState) -> dict:
+        """
+        Node that drops the retrieved documents, so checkpoints only keep the
+        conversation history.
+        """
+        return {"documents": []}
+
+    async def _retrieve_documents(self, state: GraphState) -> dict:
+        """
+        Node that retrieves documents using the rewritten question, searching
+        with the (memoized) embedding computed during the cache lookup.
+        Documents already retrieved speculatively are kept.
+
+        When `RERANKER_MODEL` is set, the documents are re-ranked with a local
+        cross-encoder and only the best `RERANK_TOP_N` are kept, shrinking the
+        context without losing the most relevant chunks.
         """
         question = state["rewritten_question"]
         documents = state["documents"]
-        original_question = state["question"]
-        previous_messages = state["messages"]
 
-        context = "\n\n".join([doc.page_content for doc in documents])
+        if documents:
+            logger.info("Using %d speculatively retrieved documents", len(documents))
+        else:
+            documents = await self._search(await self._embed_query(question))
+            logger.info("Retrieved %d documents", len(documents))
+
+        if RERANKER_MODEL and len(documents) > RERANK_TOP_N:
+            # Cross-encoder scoring is CPU bound
+            documents = await asyncio.to_thread(
+                rerank, question, documents, RERANK_TOP_N
+            )
 
-        today = datetime.now().strftime("%Y-%m-%d")
-        answer_prompt = self.build_prompt().partial(date=today)
+        return {"documents": documents}
 
-        answer_chain = answer_prompt | self.llm
-        response = answer_chain.invoke({"input": question, "context": context})
+    async def _final_answer(self, state: GraphState) -> dict:
+        """
+        Node that generates the final answer using retrieved documents.
+        """
+        question = state["rewritten_question"]
+        documents = state["documents"]
+
+        context = self._format_context(self._pack_context(documents))
+        response = await self.get_answer_chain().ainvoke(
+            {"input": question, "context": context}
+        )
 
         answer = response.content
         logger.info("Answer generated successfully")
 
-        updated_messages = previous_messages.copy()
-        updated_messages.append(HumanMessage(content=original_question))
-        updated_messages.append(AIMessage(content=answer))
+        self.cache.put(
+            self._question_key(question),
+            await self._embed_query(question),
+            {"answer": answer, "documents": documents},
+        )
+
+        return {"answer": answer, "messages": self._append_turn(state, answer)}
+
+    @staticmethod
+    def _question_key(question: str) -> str:
+        """Exact cache key of a question: lowercased, whitespace collapsed."""
+        return " ".join(question.lower().split())
 
-        return {"answer": answer, "messages": updated_messages}
+    @staticmethod
+    def _pack_context(
+        documents: list[Any], max_tokens: int = MAX_CONTEXT_TOKENS
+    ) -> list[Any]:
+        """
+        Select the documents sent to the LLM: repeated chunks are dropped and
+        documents are kept in retrieval order until `max_tokens` is reached,
+        cutting the last one at a sentence boundary.
+        """
+        packed = []
+        seen = set()
+        budget = max_tokens
+        for doc in documents:
+            key = _document_key(doc)
+            if key in seen:
+                continue
+            seen.add(key)
+
+            tokens = count_tokens(doc.page_content)
+            if tokens <= budget:
+                packed.append(doc)
+                budget -= tokens
+                continue
+
+            sentences = []
+            for sentence in SENTENCE_BOUNDARY.split(doc.page_content):
+                tokens = count_tokens(sentence)
+                if tokens > budget:
+                    break
+                sentences.append(sentence)
+                budget -= tokens
+            if sentences:
+                packed.append(
+                    Document(page_content=" ".join(sentences), metadata=doc.metadata)
+                )
+            break
+
+        if len(packed) < len(documents):
+            logger.info("Packed %d of %d documents", len(packed), len(documents))
+        return packed
+
+    @staticmethod
+    def _format_context(documents: list[Any]) -> str:
+        """
+        Join the documents into the prompt context in retrieval order, most
+        relevant first; the same retrieval always yields the same prompt.
+        """
+        return "\n\n".join(doc.page_content for doc in documents)
 
-    def _build_graph(self):
+    def _build_graph(self, checkpointer: BaseCheckpointSaver):
         """
         Builds the LangGraph state graph with separate nodes.
         """
         workflow = StateGraph(GraphState)
 
         workflow.add_node("rewrite_question", self._rewrite_question)
+        workflow.add_node("lookup_cache", self._lookup_cache)
+        workflow.add_node("cached_answer", self._cached_answer)
         workflow.add_node("retrieve_documents", self._retrieve_documents)
         workflow.add_node("final_answer", self._final_answer)
+        workflow.add_node("clear_documents", self._clear_documents)
 
         workflow.add_edge(START, "rewrite_question")
-        workflow.add_edge("rewrite_question", "retrieve_documents")
+        workflow.add_edge("rewrite_question", "lookup_cache")
+        workflow.add_conditional_edges(
+            "lookup_cache",
+            self._route_after_cache,
+            ["cached_answer", "retrieve_documents"],
+        )
+        workflow.add_edge("cached_answer", "clear_documents")
         workflow.add_edge("retrieve_documents", "final_answer")
+        workflow.add_edge("final_answer", "clear_documents")
+        workflow.add_edge("clear_documents", END)
 
-        memory = MemorySaver()
+        return workflow.compile(checkpointer=checkpointer)
 
-        return workflow.compile(checkpointer=memory)
-
-    def generate_answer(
-        self,
-        question: str,
-        thread_id: str,
-    ) -> dict[str, Any]:
+    def clear_cache(self):
         """
-        Generate an answer to a question using the RAG pipeline.
+        Drop every cached answer, e.g. after new documents are ingested.
+        """
+        self.cache.clear()
 
-        Args:
-            question: The question to answer
-            thread_id: The conversation ID
+    async def _run_graph(
+        self, question: str, thread_id: str, stream_mode: str | list[str]
+    ) -> AsyncIterator[Any]:
+        """
+        Run the graph for a question in a conversation, yielding what
+        `astream` emits for `stream_mode`.
 
-        Returns:
-            Dict containing the answer, rewritten_question, and source documents
+        The graph runs asynchronously, so the LLM, embeddings and retrieval
+        calls of concurrent requests are multiplexed on the event loop instead
+        of each holding a worker thread. Only the final state is checkpointed.
         """
         config = {"configurable": {"thread_id": thread_id}}
 
-        snapshot = self.graph.get_state(config)
+        snapshot = await self.graph.aget_state(config)
         previous_messages = []
 
         if snapshot and snapshot.values:
@@ -208,7 +506,7 @@ class RAGPipeline:
                 len(previous_messages),
             )
 
-        result = self.graph.invoke(
+        async for item in self.graph.astream(
             {
                 "question": question,
                 "rewritten_question": None,
@@ -217,18 +515,95 @@ class RAGPipeline:
                 "messages": previous_messages,
             },
             config=config,
-        )
+            stream_mode=stream_mode,
+            durability="exit",
+        ):
+            yield item
 
-        answer = result["answer"]
-        rewritten_question = result["rewritten_question"]
-        documents = result["documents"]
-
-        sources = [
-            {"content": doc.page_content, "metadata": doc.metadata} for doc in documents
-        ]
+    @staticmethod
+    def _collect_update(result: dict[str, Any], update: dict[str, Any]):
+        """
+        Merge the node outputs of an update into `result`. The documents are
+        read from here, since the final state no longer holds them.
+        """
+        for node, output in update.items():
+            if node != "clear_documents" and output:
+                result.update(output)
 
+    @staticmethod
+    def _build_response(result: dict[str, Any]) -> dict[str, Any]:
+        """Shape the collected node outputs into the pipeline response."""
         return {
-            "answer": answer,
-            "rewritten_question": rewritten_question,
-            "sources": sources,
+            "answer": result["answer"],
+            "rewritten_question": result["rewritten_question"],
+            "sources": tuple(
+                {"content": doc.page_content, "metadata": doc.metadata}
+                for doc in result.get("documents", [])
+            ),
         }
+
+    async def generate_answer(
+        self,
+        question: str,
+        thread_id: str,
+    ) -> dict[str, Any]:
+        """
+        Generate an answer to a question using the RAG pipeline.
+
+        Args:
+            question: The question to answer
+            thread_id: The conversation ID
+
+        Returns:
+            Dict containing the answer, rewritten_question, and source documents
+        """
+        result: dict[str, Any] = {}
+        async for update in self._run_graph(question, thread_id, "updates"):
+            self._collect_update(result, update)
+
+        return self._build_response(result)
+
+    async def stream_answer(
+        self,
+        question: str,
+        thread_id: str,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """
+        Generate an answer to a question, yielding the answer tokens as the
+        LLM produces them.
+
+        The history rewrite, retrieval and caching run as in
+        `generate_answer`; a cached answer is yielded as a single token.
+
+        Args:
+            question: The question to answer
+            thread_id: The conversation ID
+
+        Yields:
+            `{"type": "token", "content": ...}` dicts, then one
+            `{"type": "done", ...}` dict with the `generate_answer` response
+        """
+        result: dict[str, Any] = {}
+        streamed = False
+        async for mode, payload in self._run_graph(
+            question, thread_id, ["updates", "messages"]
+        ):
+            if mode == "updates":
+                self._collect_update(result, payload)
+                continue
+
+            # Messages written to the state are emitted too; only LLM chunks
+            # of the answer node are tokens
+            chunk, metadata = payload
+            if (
+                isinstance(chunk, AIMessageChunk)
+                and metadata.get("langgraph_node") == "final_answer"
+                and chunk.content
+            ):
+                streamed = True
+                yield {"type": "token", "content": chunk.content}
+
+        response = self._build_response(result)
+        if not streamed:
+            yield {"type": "token", "content": response["answer"]}
+        yield {"type": "done", **response}
@@ -0,0 +1,46 @@
+import logging
+from typing import Any
+
+from .settings import RERANKER_MODEL
+from .singleton import locked_singleton
+
+logger = logging.getLogger(__name__)
+
+
+@locked_singleton
+def get_reranker() -> Any:
+    """
+    Return the cross-encoder re-ranker, loaded on first use and shared by
+    every `RAGPipeline`.
+
+    The model is named by `RERANKER_MODEL` (e.g.
+    `Xenova/ms-marco-MiniLM-L-6-v2`). It runs on the local CPU through
+    FastEmbed and requires the `local-embeddings` extra.
+
+    Returns:
+        FastEmbed `TextCrossEncoder` instance
+    """
+    from fastembed.rerank.cross_encoder import TextCrossEncoder
+
+    logger.info("Using re-ranker model: %s", RERANKER_MODEL)
+    return TextCrossEncoder(model_name=RERANKER_MODEL)
+
+
+def rerank(question: str, documents: list[Any], top_n: int) -> list[Any]:
+    """
+    Score each document against the question with the cross-encoder and
+    keep the `top_n` best, most relevant first.
+
+    Args:
+        question: Standalone question
+        documents: Retrieved documents
+        top_n: Number of documents to keep
+
+    Returns:
+        The best scoring documents
+    """
+    scores = list(
+        get_reranker().rerank(question, [doc.page_content for doc in documents])
+    )
+    ranked = sorted(range(len(documents)), key=scores.__getitem__, reverse=True)
+    return [documents[index] for index in ranked[:top_n]]
@@ -8,10 +8,37 @@ if os.getenv("ENV", "development") == "development":
 
 LLM_MODEL = "gpt-5.1"
 TEMPERATURE = 0.5
+# Token budget for the retrieved context sent with each answer prompt
+MAX_CONTEXT_TOKENS = 3000
+# Question/answer pairs kept in each conversation's history
+MAX_HISTORY_TURNS = 8
+# SQLite file for conversation checkpoints, shared by all workers; empty keeps
+# them in memory per process
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", "")
 EMBEDDINGS_MODEL = "text-embedding-3-small"
+EMBEDDINGS_BATCH_SIZE = 256
+EMBEDDINGS_WORKERS = 4
+# New chunks at least this similar to a stored chunk are not stored
+NEAR_DUPLICATE_THRESHOLD = 0.99
+# Local quantized embeddings model (e.g. "BAAI/bge-small-en-v1.5"), empty for OpenAI
+LOCAL_EMBEDDINGS_MODEL = os.getenv("LOCAL_EMBEDDINGS_MODEL", "")
+# Local cross-encoder (e.g. "Xenova/ms-marco-MiniLM-L-6-v2") that re-ranks the
+# retrieved chunks down to RERANK_TOP_N, empty to disable
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "")
+RERANK_TOP_N = 4
+
+CACHE_MAXSIZE = 1024
+CACHE_TTL = 600
+CACHE_SIMILARITY_THRESHOLD = 0.95
+QUERY_EMBEDDINGS_CACHE_SIZE = 2048
+# Keep documents retrieved for the original question when the rewritten
+# question is at least this similar to it
+SPECULATIVE_RETRIEVAL_THRESHOLD = 0.95
 
 CHUNK_SIZE = {"en": 350, "es": 460}
 CHUNK_OVERLAP = {"en": 50, "es": 60}
+# Chunks below this many tokens are merged into a neighbour from the same file
+MIN_CHUNK_TOKENS = 100
 
 _raw_base_dir = os.getenv("BASE_DIR", "app")
 BASE_DIR = Path(_raw_base_dir).resolve()
@@ -20,3 +47,9 @@ DATABASE_DIR = os.path.join(BASE_DIR, "chroma_db")
 
 API_URL = os.getenv("API_URL", "")
 CDN_URL = os.getenv("CDN_URL", "")
+DOWNLOAD_WORKERS = 16
+# PDFs with more pages than this are extracted by a pool of PDF_WORKERS processes
+PARALLEL_PDF_MIN_PAGES = 20
+PDF_WORKERS = min(4, os.cpu_count() or 1)
+# Rebuild the collection on startup even when the persisted one is populated
+FORCE_REINDEX = os.getenv("FORCE_REINDEX", "false").lower() in ("1", "true", "yes")
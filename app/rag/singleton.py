@@ -0,0 +1,47 @@
+import functools
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+_UNSET = object()
+
+
+class LockedSingleton(Generic[T]):
+    """
+    Zero-argument factory that builds its object on the first call and returns
+    the same one afterwards.
+
+    The English and Spanish pipelines are initialized concurrently at startup,
+    in worker threads, so shared clients, models and pools are built under a
+    lock: a bare `functools.cache` may run the builder twice in a race, and
+    the losing instance (a connection pool, an ONNX model) would leak.
+    """
+
+    def __init__(self, build: Callable[[], T]):
+        functools.update_wrapper(self, build)
+        self._build = build
+        self._lock = threading.Lock()
+        self._instance = _UNSET
+
+    def __call__(self) -> T:
+        with self._lock:
+            if self._instance is _UNSET:
+                self._instance = self._build()
+            return self._instance
+
+    def reset(self) -> Optional[T]:
+        """
+        Drop the shared object, so the next call builds a new one.
+
+        Returns:
+            The dropped object, or None if it was never built
+        """
+        with self._lock:
+            instance, self._instance = self._instance, _UNSET
+        return None if instance is _UNSET else instance
+
+
+def locked_singleton(build: Callable[[], T]) -> LockedSingleton[T]:
+    """Decorate a zero-argument builder into a thread-safe shared instance."""
+    return LockedSingleton(build)
@@ -0,0 +1,31 @@
+import functools
+
+import tiktoken
+
+from .settings import LLM_MODEL
+
+# Encoding of models tiktoken cannot map yet (e.g. newer GPT releases)
+DEFAULT_ENCODING = "o200k_base"
+
+
+@functools.lru_cache(maxsize=4)
+def get_encoder(model: str = LLM_MODEL) -> tiktoken.Encoding:
+    """
+    Load the token encoding of a model once per process. Building an encoding
+    parses its whole BPE table, so it is shared by the loader and pipelines.
+    """
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+@functools.lru_cache(maxsize=8192)
+def count_tokens(text: str, model: str = LLM_MODEL) -> int:
+    """
+    Count the tokens of a text for a model.
+
+    Retrieved chunks have stable contents, so counts are memoized and the same
+    chunk is not re-tokenized on every request.
+    """
+    return len(get_encoder(model).encode_ordinary(text))
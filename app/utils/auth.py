@@ -1,15 +1,22 @@
+import asyncio
+import hmac
 import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from functools import cache
 
 import bcrypt
+import jwt
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import (
     HTTPAuthorizationCredentials,
     HTTPBearer,
     OAuth2PasswordBearer,
 )
-from jose import JWTError, jwt
 
 if os.getenv("ENV", "development") == "development":
     from dotenv import load_dotenv
@@ -20,38 +27,80 @@ logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# bcrypt checks are CPU bound, so they run here instead of on the event loop
+_BCRYPT_POOL = ThreadPoolExecutor(
+    max_workers=os.cpu_count() or 1, thread_name_prefix="bcrypt"
+)
+
+# Decoded payloads of recently verified tokens, so a replayed token skips the
+# signature check; entries are also dropped once the token expires
+_decoded_tokens: TTLCache = TTLCache(maxsize=4096, ttl=60)
+_decoded_tokens_lock = threading.Lock()
+
 
-def authenticate(username: str, password: str) -> bool:
+@cache
+def _get_jwt_settings() -> tuple[str, str]:
+    """Return the JWT secret key and algorithm, read once from the environment."""
+    return os.getenv("SECRET_KEY"), os.getenv("ALGORITHM")
+
+
+async def authenticate(username: str, password: str) -> bool:
     """Authenticate a user."""
     expected_username = os.getenv("USERNAME")
     hashed_password = os.getenv("HASHED")
-    if username != expected_username:
+    if not expected_username or not hashed_password:
+        return False
+    if not hmac.compare_digest(
+        username.encode("utf-8"), expected_username.encode("utf-8")
+    ):
         return False
-    return bcrypt.checkpw(password.encode("utf-8"), hashed_password.encode("utf-8"))
+    return await asyncio.get_running_loop().run_in_executor(
+        _BCRYPT_POOL,
+        bcrypt.checkpw,
+        password.encode("utf-8"),
+        hashed_password.encode("utf-8"),
+    )
 
 
 def create_access_token(username: str) -> str:
     """Create a JWT access token."""
-    secret_key = os.getenv("SECRET_KEY")
-    algorithm = os.getenv("ALGORITHM")
+    secret_key, algorithm = _get_jwt_settings()
     expire = datetime.now(timezone.utc) + timedelta(minutes=30)
     data = {"sub": username, "exp": expire}
-    encoded_jwt = jwt.encode(claims=data, key=secret_key, algorithm=algorithm)
+    encoded_jwt = jwt.encode(data, secret_key, algorithm=algorithm)
     return encoded_jwt
 
 
 def decode_token(token: str) -> dict:
     """Decode a JWT token."""
-    secret_key = os.getenv("SECRET_KEY")
-    algorithm = os.getenv("ALGORITHM")
+    with _decoded_tokens_lock:
+        payload = _decoded_tokens.get(token)
+    if payload is not None:
+        if payload["exp"] > time.time():
+            return payload
+        with _decoded_tokens_lock:
+            _decoded_tokens.pop(token, None)
+        logger.error("Failed to decode token: Signature has expired.")
+        return None
+
+    secret_key, algorithm = _get_jwt_settings()
     try:
         logger.info("Decoding token")
-        payload = jwt.decode(token=token, key=secret_key, algorithms=algorithm)
-        return payload
-    except JWTError as e:
+        payload = jwt.decode(
+            token,
+            secret_key,
+            algorithms=[algorithm],
+            options={"require": ["exp", "sub"]},
+        )
+    except jwt.PyJWTError as e:
         logger.error("Failed to decode token: %s", str(e))
         return None
 
+    if "exp" in payload:
+        with _decoded_tokens_lock:
+            _decoded_tokens[token] = payload
+    return payload
+
 
 security = HTTPBearer()
 
@@ -0,0 +1,49 @@
+from pathlib import Path
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from pydantic_core import PydanticSerializationError
+
+
+def _default(obj: Any) -> Any:
+    """Serialize objects that orjson does not support natively."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, Path):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize content with orjson, like `DefaultORJSONResponse`."""
+    return orjson.dumps(
+        content,
+        default=_default,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+    )
+
+
+class DefaultORJSONResponse(ORJSONResponse):
+    """ORJSONResponse that also serializes stray langchain `Document` objects,
+    pydantic models, sets and paths found in the response content."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class PydanticResponse(DefaultORJSONResponse):
+    """Render an already-trusted pydantic model (e.g. built with
+    `model_construct`) with pydantic's own JSON serializer, without
+    re-validating it. Falls back to orjson for content it cannot serialize."""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            try:
+                return content.model_dump_json().encode("utf-8")
+            except PydanticSerializationError:
+                content = content.model_dump(mode="python")
+        return super().render(content)
@@ -0,0 +1,45 @@
+import importlib
+import sys
+from functools import lru_cache
+from types import ModuleType
+from unittest.mock import MagicMock
+
+import bcrypt
+import pytest
+
+# The tests never call OpenAI, so stand in for langchain_openai before any app
+# module imports it instead of loading the client and patching it per test.
+langchain_openai = ModuleType("langchain_openai")
+langchain_openai.ChatOpenAI = MagicMock(name="ChatOpenAI")
+langchain_openai.OpenAIEmbeddings = MagicMock(name="OpenAIEmbeddings")
+sys.modules["langchain_openai"] = langchain_openai
+
+TEST_PASSWORD = "testpassword123"
+
+
+@lru_cache(maxsize=4)
+def _hash(password: str) -> str:
+    """Hash a password once per test session."""
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=4)).decode(
+        "utf-8"
+    )
+
+
+@pytest.fixture(scope="session")
+def hashed_password() -> str:
+    """bcrypt hash of the test password, shared by every test module."""
+    return _hash(TEST_PASSWORD)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def stub_modules():
+    """Drop the module stubs from `sys.modules` when the session ends."""
+    yield
+    if sys.modules.get("langchain_openai") is langchain_openai:
+        del sys.modules["langchain_openai"]
+
+
+@pytest.fixture(scope="session")
+def rag_module():
+    """`app.rag.rag_pipeline`, imported once against the stubs above."""
+    return importlib.import_module("app.rag.rag_pipeline")
@@ -1,26 +1,296 @@
-from unittest.mock import MagicMock, patch
+import asyncio
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from langchain_core.documents import Document
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_openai import ChatOpenAI
 
 from app.rag.rag_pipeline import RAGPipeline
 
 
+@pytest.fixture(autouse=True)
+def word_tokens(rag_module, monkeypatch):
+    """Count tokens as words, so no encoding has to be downloaded."""
+    monkeypatch.setattr(rag_module, "count_tokens", lambda text: len(text.split()))
+
+
 @pytest.fixture
 def mock_vectorstore():
-    vectorstore = MagicMock()
-    retriever = MagicMock()
-    vectorstore.as_retriever.return_value = retriever
-    return vectorstore
+    return SimpleNamespace(as_retriever=lambda **kwargs: SimpleNamespace())
 
 
-@pytest.fixture
-def mock_llm():
-    with patch("app.rag.rag_pipeline.ChatOpenAI") as MockLLM:
-        llm_instance = MockLLM.return_value
-        yield llm_instance
+@pytest.fixture(scope="module", autouse=True)
+def mock_get_embeddings(rag_module):
+    with patch.object(rag_module, "get_embeddings") as get_embeddings:
+        yield get_embeddings
+
+
+@pytest.fixture(autouse=True)
+def embeddings(mock_get_embeddings):
+    """A fresh embeddings model from the patched `get_embeddings` per test."""
+    mock_get_embeddings.return_value = MagicMock()
+    return mock_get_embeddings.return_value
 
 
-@patch("app.rag.rag_pipeline.OpenAIEmbeddings")
-def test_rag_pipeline_initialization(mock_embeddings, mock_vectorstore, mock_llm):
+@pytest.fixture(autouse=True)
+def chat_openai():
+    """The ChatOpenAI stub from conftest, reset after every test."""
+    yield ChatOpenAI
+    ChatOpenAI.reset_mock(return_value=True)
+
+
+def test_rag_pipeline_initialization(mock_vectorstore):
     pipeline = RAGPipeline(vectorstore=mock_vectorstore)
     assert pipeline.graph is not None
+
+
+@pytest.mark.asyncio
+async def test_generate_answer_served_from_cache(
+    embeddings, mock_vectorstore, chat_openai
+):
+    embeddings.aembed_query = AsyncMock(return_value=[1.0, 0.0])
+    search = AsyncMock(return_value=[Document(page_content="I live in Bogotá")])
+    mock_vectorstore.amax_marginal_relevance_search_by_vector = search
+
+    chat_openai.return_value = FakeListChatModel(responses=["Bogotá"])
+    pipeline = RAGPipeline(vectorstore=mock_vectorstore)
+
+    first = await pipeline.generate_answer("Where do you live?", thread_id="a")
+    second = await pipeline.generate_answer("Where do you live?", thread_id="b")
+
+    assert first["answer"] == second["answer"] == "Bogotá"
+    assert second["sources"] == first["sources"]
+    assert search.call_count == 1
+    search.assert_called_with([1.0, 0.0], k=6, fetch_k=20, lambda_mult=0.5)
+    assert embeddings.aembed_query.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_speculative_retrieval_reused(embeddings, mock_vectorstore, chat_openai):
+    vectors = {
+        "Where do you live?": [1.0, 0.0],
+        "Where do you work?": [0.0, 1.0],
+        "Where does Luis work?": [0.1, 1.0],
+    }
+    embeddings.aembed_query = AsyncMock(side_effect=vectors.get)
+    search = AsyncMock(return_value=[Document(page_content="I work at Acme")])
+    mock_vectorstore.amax_marginal_relevance_search_by_vector = search
+
+    chat_openai.return_value = FakeListChatModel(
+        responses=["Bogotá", "Where does Luis work?", "Acme"]
+    )
+    pipeline = RAGPipeline(vectorstore=mock_vectorstore)
+
+    await pipeline.generate_answer("Where do you live?", thread_id="a")
+    result = await pipeline.generate_answer("Where do you work?", thread_id="a")
+
+    assert result["answer"] == "Acme"
+    assert result["rewritten_question"] == "Where does Luis work?"
+    assert search.call_count == 2
+    search.assert_called_with([0.0, 1.0], k=6, fetch_k=20, lambda_mult=0.5)
+
+
+@pytest.mark.asyncio
+async def test_speculative_retrieval_cancelled_when_embedding_fails(
+    embeddings, mock_vectorstore, chat_openai
+):
+    started = asyncio.Event()
+
+    async def embed(question):
+        if question == "Where do you work?":
+            started.set()
+            await asyncio.sleep(10)
+        raise RuntimeError("embeddings unavailable")
+
+    embeddings.aembed_query = AsyncMock(side_effect=embed)
+    chat_openai.return_value = FakeListChatModel(responses=["Where does Luis work?"])
+    pipeline = RAGPipeline(vectorstore=mock_vectorstore)
+    state = {"question": "Where do you work?", "messages": [HumanMessage("Hi")]}
+
+    with pytest.raises(RuntimeError):
+        await pipeline._rewrite_question(state)
+
+    await asyncio.sleep(0)
+    assert started.is_set()
+    assert asyncio.all_tasks() == {asyncio.current_task()}
+
+
+def test_format_history():
+    history = [HumanMessage(content="Where do you live?"), AIMessage(content="Bogotá")]
+
+    assert RAGPipeline._format_history(history) == (
+        "User: Where do you live?\nAssistant: Bogotá"
+    )
+
+
+def test_format_context_keeps_retrieval_order():
+    first = Document(page_content="First", metadata={"content_hash": "b"})
+    second = Document(page_content="Second", metadata={"content_hash": "a"})
+
+    context = RAGPipeline._format_context([first, second])
+
+    assert context == "First\n\nSecond"
+
+
+def test_question_key_normalizes_case_and_whitespace():
+    key = RAGPipeline._question_key("Where do you work?")
+
+    assert key == RAGPipeline._question_key("  where DO you\twork? ")
+    assert key != RAGPipeline._question_key("Where do you live?")
+
+
+@pytest.mark.asyncio
+async def test_query_embedding_not_checkpointed(
+    embeddings, mock_vectorstore, chat_openai
+):
+    embeddings.aembed_query = AsyncMock(return_value=[1.0, 0.0])
+    mock_vectorstore.amax_marginal_relevance_search_by_vector = AsyncMock(
+        return_value=[Document(page_content="I live in Bogotá")]
+    )
+
+    chat_openai.return_value = FakeListChatModel(responses=["Bogotá"])
+    pipeline = RAGPipeline(vectorstore=mock_vectorstore)
+
+    await pipeline.generate_answer("Where do you live?", thread_id="a")
+    snapshot = await pipeline.graph.aget_state({"configurable": {"thread_id": "a"}})
+
+    assert "query_embedding" not in snapshot.values
+
+
+def test_answer_chain_rebuilt_only_when_day_changes(mock_vectorstore, chat_openai):
+    chat_openai.return_value = FakeListChatModel(responses=["Bogotá"])
+    pipeline = RAGPipeline(vectorstore=mock_vectorstore)
+
+    with patch("app.rag.rag_pipeline.date") as mock_date:
+        mock_date.today.return_value = date(2025, 1, 1)
+        first = pipeline.get_answer_chain()
+        assert pipeline.get_answer_chain() is first
+
+        mock_date.today.return_value = date(2025, 1, 2)
+        second = pipeline.get_answer_chain()
+
+    assert second is not first
+    assert second.first.partial_variables == {"date": "2025-01-02"}
+
+
+def test_pack_context_deduplicates_and_caps_tokens():
+    documents = [
+        Document(page_content="one two three", metadata={"content_hash": "a"}),
+        Document(page_content="one two three", metadata={"content_hash": "a"}),
+        Document(page_content="Four five. Six seven. Eight.", metadata={"id": 2}),
+        Document(page_content="nine", metadata={"content_hash": "c"}),
+    ]
+
+    packed = RAGPipeline._pack_context(documents, max_tokens=7)
+
+    assert [doc.page_content for doc in packed] == [
+        "one two three",
+        "Four five. Six seven.",
+    ]
+    assert packed[1].metadata == {"id": 2}
+
+
+@pytest.mark.asyncio
+async def test_history_trimmed_and_documents_not_checkpointed(
+    embeddings, mock_vectorstore, chat_openai
+):
+    embeddings.aembed_query = AsyncMock(return_value=[1.0, 0.0])
+    mock_vectorstore.amax_marginal_relevance_search_by_vector = AsyncMock(
+        return_value=[Document(page_content="I live in Bogotá")]
+    )
+
+    chat_openai.return_value = FakeListChatModel(responses=["Bogotá"])
+    pipeline = RAGPipeline(vectorstore=mock_vectorstore)
+
+    for turn in range(10):
+        result = await pipeline.generate_answer(f"Question {turn}?", thread_id="a")
+    snapshot = await pipeline.graph.aget_state({"configurable": {"thread_id": "a"}})
+
+    assert result["sources"][0]["content"] == "I live in Bogotá"
+    assert len(snapshot.values["messages"]) == 16
+    assert snapshot.values["messages"][-2].content == "Question 9?"
+    assert snapshot.values["documents"] == []
+
+
+@pytest.mark.asyncio
+@patch("app.rag.rag_pipeline.RERANKER_MODEL", "reranker")
+@patch("app.rag.reranker.get_reranker")
+async def test_retrieved_documents_reranked(
+    mock_get_reranker, embeddings, mock_vectorstore, chat_openai
+):
+    embeddings.aembed_query = AsyncMock(return_value=[1.0, 0.0])
+    documents = [Document(page_content=f"chunk {i}") for i in range(6)]
+    mock_vectorstore.amax_marginal_relevance_search_by_vector = AsyncMock(
+        return_value=documents
+    )
+    mock_get_reranker.return_value.rerank.return_value = [0.1, 0.9, 0.2, 0.8, 0.3, 0.7]
+
+    chat_openai.return_value = FakeListChatModel(responses=["Bogotá"])
+    pipeline = RAGPipeline(vectorstore=mock_vectorstore)
+
+    result = await pipeline.generate_answer("Where do you live?", thread_id="a")
+
+    assert [source["content"] for source in result["sources"]] == [
+        "chunk 1",
+        "chunk 3",
+        "chunk 5",
+        "chunk 4",
+    ]
+    mock_get_reranker.return_value.rerank.assert_called_once_with(
+        "Where do you live?", [doc.page_content for doc in documents]
+    )
+
+
+@pytest.mark.asyncio
+async def test_stream_answer_yields_tokens(embeddings, mock_vectorstore, chat_openai):
+    embeddings.aembed_query = AsyncMock(return_value=[1.0, 0.0])
+    mock_vectorstore.amax_marginal_relevance_search_by_vector = AsyncMock(
+        return_value=[Document(page_content="I live in Bogotá")]
+    )
+
+    chat_openai.return_value = FakeListChatModel(responses=["Bogotá"])
+    pipeline = RAGPipeline(vectorstore=mock_vectorstore)
+
+    events = [event async for event in pipeline.stream_answer("Where?", thread_id="a")]
+    cached = [event async for event in pipeline.stream_answer("Where?", thread_id="b")]
+    snapshot = await pipeline.graph.aget_state({"configurable": {"thread_id": "a"}})
+
+    tokens = [event["content"] for event in events if event["type"] == "token"]
+    assert len(tokens) > 1
+    assert "".join(tokens) == "Bogotá"
+    assert events[-1]["type"] == "done"
+    assert events[-1]["sources"][0]["content"] == "I live in Bogotá"
+    assert cached[0] == {"type": "token", "content": "Bogotá"}
+    assert snapshot.values["messages"][-1].content == "Bogotá"
+
+
+@pytest.mark.asyncio
+async def test_history_persisted_in_sqlite(
+    embeddings, mock_vectorstore, tmp_path, chat_openai
+):
+    sqlite = pytest.importorskip("langgraph.checkpoint.sqlite.aio")
+    embeddings.aembed_query = AsyncMock(return_value=[1.0, 0.0])
+    mock_vectorstore.amax_marginal_relevance_search_by_vector = AsyncMock(
+        return_value=[Document(page_content="I live in Bogotá")]
+    )
+    database = str(tmp_path / "checkpoints.db")
+
+    async with sqlite.AsyncSqliteSaver.from_conn_string(database) as checkpointer:
+        chat_openai.return_value = FakeListChatModel(responses=["Bogotá"])
+        pipeline = RAGPipeline(vectorstore=mock_vectorstore, checkpointer=checkpointer)
+        await pipeline.generate_answer("Where do you live?", thread_id="a")
+
+    async with sqlite.AsyncSqliteSaver.from_conn_string(database) as checkpointer:
+        restarted = RAGPipeline(vectorstore=mock_vectorstore, checkpointer=checkpointer)
+        snapshot = await restarted.graph.aget_state(
+            {"configurable": {"thread_id": "a"}}
+        )
+
+    assert [message.content for message in snapshot.values["messages"]] == [
+        "Where do you live?",
+        "Bogotá",
+    ]
@@ -1,12 +1,12 @@
-import os
 from datetime import datetime, timedelta, timezone
 from unittest.mock import patch
 
-import bcrypt
+import jwt
 import pytest
-from jose import JWTError, jwt
 
 from app.utils.auth import (
+    _decoded_tokens,
+    _get_jwt_settings,
     authenticate,
     create_access_token,
     decode_token,
@@ -14,45 +14,110 @@ from app.utils.auth import (
 
 TEST_USERNAME = "testuser"
 TEST_PASSWORD = "testpassword123"
-TEST_SALT = bcrypt.gensalt()
-TEST_HASHED_PASSWORD = bcrypt.hashpw(TEST_PASSWORD.encode("utf-8"), TEST_SALT).decode(
-    "utf-8"
-)
+TEST_SECRET_KEY = "test_secret_key_with_at_least_32_bytes"
+TEST_ALGORITHM = "HS256"
+
+
+@pytest.fixture(scope="module", autouse=True)
+def auth_env_vars(hashed_password):
+    """Environment variables for testing authentication, set once per module."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("SECRET_KEY", TEST_SECRET_KEY)
+        mp.setenv("ALGORITHM", TEST_ALGORITHM)
+        mp.setenv("HASHED", hashed_password)
+        mp.setenv("USERNAME", TEST_USERNAME)
+        _get_jwt_settings.cache_clear()
+        yield
+    _get_jwt_settings.cache_clear()
 
 
 @pytest.fixture(autouse=True)
-def auth_env_vars(monkeypatch):
-    """Environment variables for testing authentication."""
-    monkeypatch.setenv("SECRET_KEY", "test_secret_key")
-    monkeypatch.setenv("ALGORITHM", "HS256")
-    monkeypatch.setenv("HASHED", TEST_HASHED_PASSWORD)
-    monkeypatch.setenv("USERNAME", TEST_USERNAME)
+def clear_decoded_tokens():
+    """Start every test with an empty decoded token cache."""
+    _decoded_tokens.clear()
 
 
-class TestAuthenticate:
-    """Tests for the authenticate function."""
+@pytest.fixture(scope="module")
+def valid_token(auth_env_vars):
+    """Access token for the test user, created once per module."""
+    return create_access_token(TEST_USERNAME)
 
-    def test_authenticate_success(self):
-        """Test successful authentication with correct credentials."""
-        assert authenticate(TEST_USERNAME, TEST_PASSWORD) is True
 
-    def test_authenticate_wrong_username(self):
-        """Test authentication with incorrect username."""
-        assert authenticate("wronguser", TEST_PASSWORD) is False
+@pytest.fixture(scope="session")
+def wrong_key_token():
+    """Access token for the test user signed with another secret key."""
+    return jwt.encode(
+        {
+            "sub": TEST_USERNAME,
+            "exp": datetime.now(timezone.utc) + timedelta(days=3650),
+        },
+        "wrong_secret_key_with_at_least_32_bytes",
+        algorithm=TEST_ALGORITHM,
+    )
+
+
+@pytest.fixture(scope="session")
+def expired_token():
+    """Access token for the test user that expired long ago."""
+    return jwt.encode(
+        {"sub": TEST_USERNAME, "exp": datetime(2000, 1, 1, tzinfo=timezone.utc)},
+        TEST_SECRET_KEY,
+        algorithm=TEST_ALGORITHM,
+    )
 
-    def test_authenticate_wrong_password(self):
-        """Test authentication with incorrect password."""
-        assert authenticate(TEST_USERNAME, "wrongpassword") is False
+
+@pytest.fixture
+def fast_bcrypt(monkeypatch):
+    """Replace bcrypt verification with a plain comparison."""
+    monkeypatch.setattr(
+        "app.utils.auth.bcrypt.checkpw",
+        lambda password, hashed: password == TEST_PASSWORD.encode("utf-8"),
+    )
+
+
+@pytest.mark.usefixtures("fast_bcrypt")
+class TestAuthenticate:
+    """Tests for the authenticate function."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "username, password, expected",
+        [
+            (TEST_USERNAME, TEST_PASSWORD, True),
+            ("wronguser", TEST_PASSWORD, False),
+            (TEST_USERNAME, "wrongpassword", False),
+        ],
+        ids=["success", "wrong_username", "wrong_password"],
+    )
+    async def test_authenticate(self, username, password, expected):
+        """Test that only the configured credentials are accepted."""
+        assert await authenticate(username, password) is expected
+
+    @pytest.mark.asyncio
+    async def test_authenticate_wrong_username_skips_bcrypt(self):
+        """Test that a wrong username is rejected without checking the password."""
+        with patch("app.utils.auth.bcrypt.checkpw") as mock_checkpw:
+            assert await authenticate("wronguser", TEST_PASSWORD) is False
+        mock_checkpw.assert_not_called()
+
+
+class TestAuthenticateBcrypt:
+    """Tests for authenticate against a real bcrypt hash."""
+
+    @pytest.mark.asyncio
+    async def test_authenticate_checks_hash(self):
+        """Test that only the hashed password is accepted."""
+        assert await authenticate(TEST_USERNAME, TEST_PASSWORD) is True
+        assert await authenticate(TEST_USERNAME, "wrongpassword") is False
 
 
 class TestCreateAccessToken:
     """Tests for the create_access_token function."""
 
-    def test_create_access_token_success(self):
+    def test_create_access_token_success(self, valid_token):
         """Test successful token creation."""
-        token = create_access_token(TEST_USERNAME)
-        assert isinstance(token, str)
-        assert len(token) > 0
+        assert isinstance(valid_token, str)
+        assert len(valid_token) > 0
 
     @patch("app.utils.auth.jwt.encode")
     def test_create_access_token_calls_encode(self, mock_encode):
@@ -62,60 +127,57 @@ class TestCreateAccessToken:
 
         assert mock_encode.called
 
-        _, kwargs = mock_encode.call_args
+        (payload, key), kwargs = mock_encode.call_args
 
-        payload = kwargs["claims"]
         assert payload["sub"] == test_username
         assert "exp" in payload
 
-        assert kwargs["key"] == os.getenv("SECRET_KEY")
-        assert kwargs["algorithm"] == os.getenv("ALGORITHM")
+        assert key == TEST_SECRET_KEY
+        assert kwargs["algorithm"] == TEST_ALGORITHM
 
 
 class TestDecodeToken:
     """Tests for the decode_token function."""
 
-    def test_decode_token_success(self):
+    def test_decode_token_success(self, valid_token):
         """Test successful token decoding."""
-        token = create_access_token(TEST_USERNAME)
-        payload = decode_token(token)
+        payload = decode_token(valid_token)
 
         assert payload is not None
         assert payload["sub"] == TEST_USERNAME
         assert "exp" in payload
 
-    def test_decode_token_invalid(self):
+    def test_decode_token_invalid(self, wrong_key_token):
         """Test decoding an invalid token."""
-        algorithm = os.getenv("ALGORITHM", "")
-        invalid_token = jwt.encode(
-            {
-                "sub": TEST_USERNAME,
-                "exp": datetime.now(timezone.utc) + timedelta(minutes=30),
-            },
-            "wrong_secret_key",
-            algorithm=algorithm,
-        )
-        payload = decode_token(invalid_token)
-        assert payload is None
+        assert decode_token(wrong_key_token) is None
 
     @patch("app.utils.auth.jwt.decode")
     def test_decode_token_jwterror_handling(self, mock_decode, caplog):
-        """Test that JWTError is properly handled and logged."""
+        """Test that PyJWTError is properly handled and logged."""
 
-        mock_decode.side_effect = JWTError("Test error")
+        mock_decode.side_effect = jwt.PyJWTError("Test error")
         result = decode_token("mocked.error.token")
         assert result is None
 
         assert "Failed to decode token" in caplog.text
 
-    def test_decode_token_expired(self):
+    def test_decode_token_cached(self, valid_token):
+        """Test that decoding the same token twice verifies it once."""
+        with patch("app.utils.auth.jwt.decode", wraps=jwt.decode) as mock_decode:
+            first = decode_token(valid_token)
+            second = decode_token(valid_token)
+
+        assert first == second
+        assert mock_decode.call_count == 1
+
+    def test_decode_token_cached_expired(self, valid_token):
+        """Test that a cached token is rejected once it expires."""
+        payload = decode_token(valid_token)
+        _decoded_tokens[valid_token] = {**payload, "exp": payload["exp"] - 3600}
+
+        assert decode_token(valid_token) is None
+        assert valid_token not in _decoded_tokens
+
+    def test_decode_token_expired(self, expired_token):
         """Test decoding an expired token."""
-        expired_payload = {
-            "sub": TEST_USERNAME,
-            "exp": datetime.now(timezone.utc) - timedelta(minutes=5),
-        }
-        secret_key = os.getenv("SECRET_KEY", "")
-        algorithm = os.getenv("ALGORITHM", "")
-        expired_token = jwt.encode(expired_payload, secret_key, algorithm)
-        payload = decode_token(expired_token)
-        assert payload is None
+        assert decode_token(expired_token) is None
@@ -0,0 +1,49 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.rag.cache import ResponseCache
+
+
+@pytest.fixture
+def cache():
+    return ResponseCache(maxsize=2, ttl=60, threshold=0.95)
+
+
+class TestResponseCache:
+    """Tests for the ResponseCache class."""
+
+    def test_exact_hit(self, cache):
+        """Test that an entry is returned for the exact same key."""
+        cache.put("question", [1.0, 0.0], {"answer": "a"})
+        assert cache.get("question") == {"answer": "a"}
+        assert cache.get("other question") is None
+
+    def test_semantic_hit_and_miss(self, cache):
+        """Test that only sufficiently similar embeddings hit the cache."""
+        cache.put("question", [1.0, 0.0], {"answer": "a"})
+        assert cache.get_similar([0.99, 0.05]) == {"answer": "a"}
+        assert cache.get_similar([0.0, 1.0]) is None
+
+    def test_maxsize_drops_oldest(self, cache):
+        """Test that the oldest semantic entry is dropped past maxsize."""
+        cache.put("q1", [1.0, 0.0, 0.0], {"answer": "1"})
+        cache.put("q2", [0.0, 1.0, 0.0], {"answer": "2"})
+        cache.put("q3", [0.0, 0.0, 1.0], {"answer": "3"})
+
+        assert cache.get_similar([1.0, 0.0, 0.0]) is None
+        assert cache.get_similar([0.0, 0.0, 1.0]) == {"answer": "3"}
+
+    def test_semantic_entries_expire(self, cache):
+        """Test that semantic entries are ignored after their TTL."""
+        with patch("app.rag.cache.time.monotonic", return_value=0.0):
+            cache.put("question", [1.0, 0.0], {"answer": "a"})
+        with patch("app.rag.cache.time.monotonic", return_value=61.0):
+            assert cache.get_similar([1.0, 0.0]) is None
+
+    def test_clear(self, cache):
+        """Test that clear empties both tiers."""
+        cache.put("question", [1.0, 0.0], {"answer": "a"})
+        cache.clear()
+        assert cache.get("question") is None
+        assert cache.get_similar([1.0, 0.0]) is None
@@ -0,0 +1,20 @@
+import pytest
+
+from app.rag.http import close_http_clients, get_async_http_client, get_http_client
+
+
+@pytest.mark.asyncio
+async def test_clients_shared_until_closed():
+    """Test that the HTTP clients are shared and recreated after closing."""
+    client = get_http_client()
+    async_client = get_async_http_client()
+
+    assert get_http_client() is client
+    assert get_async_http_client() is async_client
+
+    await close_http_clients()
+
+    assert client.is_closed
+    assert async_client.is_closed
+    assert get_async_http_client() is not async_client
+    await close_http_clients()
@@ -0,0 +1,431 @@
+import hashlib
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import fitz
+import pytest
+from langchain.schema import Document
+
+from app.rag.loader import (
+    DOWNLOAD_TIMEOUT,
+    HASH_ALGORITHM,
+    Loader,
+    _get_pdf_executor,
+    _get_text_splitter,
+)
+
+
+def count_words(text: str, model: str) -> int:
+    """Count tokens as words, and a blank separator as one token."""
+    return len(text.split()) or 1
+
+
+@pytest.fixture
+def loader():
+    """Loader with mocked embeddings and vector store."""
+    with (
+        patch("app.rag.loader.get_embeddings"),
+        patch("app.rag.loader.Chroma") as MockChroma,
+    ):
+        MockChroma.return_value._collection.metadata = {}
+        MockChroma.return_value.get.return_value = {"metadatas": []}
+        _get_text_splitter.cache_clear()
+        instance = Loader(language="en")
+        instance.vectorstore = MockChroma.return_value
+        yield instance
+    _get_text_splitter.cache_clear()
+
+
+def test_rejects_collection_built_with_other_model(loader):
+    """Test that a collection embedded with a different model is refused."""
+    loader.vectorstore._collection.metadata = {"embeddings_model": "other-model"}
+
+    with pytest.raises(ValueError, match="other-model"):
+        loader._check_embeddings_model()
+
+
+class TestCheckDuplicates:
+    """Tests for the _check_duplicates method."""
+
+    def test_no_vector_store_query(self, loader):
+        """Test that duplicates are checked against the in-memory index."""
+        loader._ensure_hash_index()
+        loader.vectorstore.get.reset_mock()
+        chunks = [Document(page_content=f"chunk {i}") for i in range(5)]
+
+        result = loader._check_duplicates(chunks)
+
+        assert result == chunks
+        loader.vectorstore.get.assert_not_called()
+
+    def test_skips_stored_and_repeated_chunks(self, loader):
+        """Test that chunks already stored or repeated in the batch are dropped."""
+        loader._hash_index = {loader._compute_hashes(["stored"])[0]}
+        chunks = [
+            Document(page_content="stored"),
+            Document(page_content="new"),
+            Document(page_content="new"),
+        ]
+
+        result = loader._check_duplicates(chunks)
+
+        assert [chunk.page_content for chunk in result] == ["new"]
+        assert result[0].metadata["content_hash"] == loader._compute_hashes(["new"])[0]
+        assert loader._compute_hashes(["new"])[0] in loader._hash_index
+
+    def test_skips_chunks_differing_only_in_overlap(self, loader):
+        """Test that a chunk whose core is already stored is a duplicate."""
+        core = "core text " * 100
+
+        def batch(middle: str) -> list[Document]:
+            return [
+                Document(page_content=text, metadata={"source": "doc.txt"})
+                for text in ("first " * 100, middle, "last " * 100)
+            ]
+
+        loader._check_duplicates(batch("a" * 200 + core + "b" * 200))
+        result = loader._check_duplicates(batch("c" * 200 + core + "d" * 200))
+
+        assert result == []
+
+    def test_keeps_short_chunks_sharing_only_a_small_middle(self, loader):
+        """Test that chunks too short for a substantial core are compared whole."""
+        middle = " Experience: 2019-2024 "
+        chunks = [
+            Document(page_content="a" * 200 + middle + "b" * 200),
+            Document(page_content="c" * 200 + middle + "d" * 200),
+        ]
+
+        result = loader._check_duplicates(chunks)
+
+        assert result == chunks
+        assert "core_hash" not in result[0].metadata
+
+    def test_keeps_outer_edges_of_first_and_last_chunks(self, loader):
+        """Test that edges without a neighbouring chunk are not trimmed."""
+        body = "shared body " * 100
+        first = Document(page_content="i" * 200 + body)
+        other = Document(page_content="o" * 200 + body)
+
+        result = loader._check_duplicates([first]) + loader._check_duplicates([other])
+
+        assert result == [first, other]
+
+    def test_skips_chunks_stored_with_legacy_hash(self, loader):
+        """Test that chunks hashed with SHA-256 before are still detected."""
+        loader._hash_index = set()
+        loader._legacy_hash_index = set(loader._compute_legacy_hashes(["stored"]))
+        chunks = [Document(page_content="stored"), Document(page_content="new")]
+
+        result = loader._check_duplicates(chunks)
+
+        assert [chunk.page_content for chunk in result] == ["new"]
+        assert result[0].metadata["hash_algo"] == HASH_ALGORITHM
+
+    def test_empty_chunks(self, loader):
+        """Test that an empty batch yields no chunks."""
+        assert loader._check_duplicates([]) == []
+
+
+def test_add_chunks_skips_near_duplicates(loader):
+    """Test that chunks nearly identical to a stored chunk are not stored."""
+    loader.embeddings.embed_documents.return_value = [[1.0, 0.0], [0.0, 1.0]]
+    loader.vectorstore._collection.count.return_value = 1
+    loader.vectorstore._collection.query.return_value = {
+        "embeddings": [[[0.999, 0.01]], [[1.0, 0.0]]]
+    }
+    chunks = [Document(page_content="near copy"), Document(page_content="new")]
+
+    ids = loader._add_chunks(chunks)
+
+    assert len(ids) == 1
+    upsert = loader.vectorstore._collection.upsert.call_args.kwargs
+    assert upsert["documents"] == ["new"]
+    assert upsert["embeddings"] == [[0.0, 1.0]]
+
+
+def test_load_hash_index_pages_through_collection(loader):
+    """Test that the hash index is read from the collection page by page."""
+    loader.vectorstore.get.reset_mock()
+    loader.vectorstore.get.side_effect = [
+        {
+            "metadatas": [
+                {"content_hash": "a", "hash_algo": HASH_ALGORITHM},
+                {"content_hash": "b", "hash_algo": HASH_ALGORITHM},
+            ]
+        },
+        {"metadatas": [{"content_hash": "legacy"}, {}]},
+        {"metadatas": []},
+    ]
+
+    with patch("app.rag.loader.HASH_INDEX_PAGE_SIZE", 2):
+        index = loader._load_hash_index()
+
+    assert index == {"a", "b"}
+    assert loader._legacy_hash_index == {"legacy"}
+    assert loader.vectorstore.get.call_count == 3
+
+
+def test_hash_index_loaded_on_first_check(loader):
+    """Test that the collection is only read when chunks are first checked."""
+    loader.vectorstore.get.assert_not_called()
+
+    loader._check_duplicates([Document(page_content="one")])
+    loader._check_duplicates([Document(page_content="two")])
+
+    loader.vectorstore.get.assert_called_once()
+
+
+def test_failed_add_releases_hashes(loader):
+    """Test that hashes are released when storing the chunks fails."""
+    loader._split_documents = lambda documents: documents
+
+    with (
+        patch.object(loader, "_add_chunks", side_effect=RuntimeError("boom")),
+        pytest.raises(RuntimeError),
+    ):
+        loader.build_vectorstore([Document(page_content="content")])
+
+    assert loader._hash_index == set()
+
+
+def test_merge_small_chunks(loader):
+    """Test that short chunks are merged into their neighbour of the same file."""
+    chunks = [
+        Document(page_content="long " * 200, metadata={"source": "a"}),
+        Document(page_content="tail", metadata={"source": "a"}),
+        Document(page_content="other file", metadata={"source": "b"}),
+        Document(page_content="long " * 349, metadata={"source": "b"}),
+    ]
+
+    with patch("app.rag.loader.count_tokens", count_words):
+        merged = loader._merge_small_chunks(chunks)
+
+    assert [chunk.metadata["source"] for chunk in merged] == ["a", "b", "b"]
+    assert merged[0].page_content.endswith("\n\ntail")
+    assert merged[1].page_content == "other file"
+
+
+def test_merge_small_chunks_within_segment(loader):
+    """Test that chunks of another page or section are never merged."""
+    chunks = [
+        Document(page_content="page one", metadata={"source": "a", "page": 1}),
+        Document(page_content="page two", metadata={"source": "a", "page": 2}),
+        Document(
+            page_content="intro",
+            metadata={"source": "a", "page": 2, "section_path": "Intro"},
+        ),
+    ]
+
+    with patch("app.rag.loader.count_tokens", count_words):
+        merged = loader._merge_small_chunks(chunks)
+
+    assert merged == chunks
+
+
+def test_merge_small_chunks_counts_separator(loader):
+    """Test that the separator counts against the chunk size."""
+    chunks = [
+        Document(page_content="long " * 349, metadata={"source": "a"}),
+        Document(page_content="tail", metadata={"source": "a"}),
+    ]
+
+    with patch("app.rag.loader.count_tokens", count_words):
+        merged = loader._merge_small_chunks(chunks)
+
+    assert len(merged) == 2
+
+
+def test_compute_hashes_are_blake2b(loader):
+    """Test that content hashes are 128-bit BLAKE2b digests, in order."""
+    texts = ["first", "second", "tercero ñ"]
+    assert loader._compute_hashes(texts) == [
+        hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+        for text in texts
+    ]
+
+
+def test_add_chunks_in_batches(loader):
+    """Test that chunks are embedded in batches and stored in order."""
+    loader.embeddings.embed_documents.side_effect = lambda texts: [[0.0]] * len(texts)
+    loader.vectorstore._collection.count.return_value = 0
+    chunks = [Document(page_content=f"chunk {i}", metadata={"i": i}) for i in range(5)]
+
+    with patch("app.rag.loader.EMBEDDINGS_BATCH_SIZE", 2):
+        ids = loader._add_chunks(chunks)
+
+    assert len(ids) == 5
+    assert loader.embeddings.embed_documents.call_count == 3
+    assert loader.vectorstore._collection.upsert.call_count == 3
+    stored = [
+        text
+        for call in loader.vectorstore._collection.upsert.call_args_list
+        for text in call.kwargs["documents"]
+    ]
+    assert stored == [chunk.page_content for chunk in chunks]
+
+
+def test_load_from_s3_skips_failed_downloads(loader):
+    """Test that a failed download does not abort loading the other files."""
+
+    def fetch(url):
+        if url.endswith("EN_broken.md"):
+            raise ConnectionError("boom")
+        return b"# Title\n\ncontent", "text/markdown", ""
+
+    loader._list_bucket_files = lambda: ["docs/EN_ok.md", "docs/EN_broken.md"]
+    loader._fetch = fetch
+
+    documents = loader._load_from_s3()
+
+    assert [doc.metadata["filename"] for doc in documents] == ["EN_ok.md"]
+
+
+def test_fetch_skips_unmodified_document(loader):
+    """Test that a stored ETag makes the download conditional."""
+    url = "https://cdn.example.com/EN_doc.md"
+    loader._hash_index = set()
+    loader._etags = {url: '"v1"'}
+
+    with patch("app.rag.loader.get_http_client") as mock_get_client:
+        mock_client = mock_get_client.return_value
+        mock_client.get.return_value.status_code = 304
+        assert loader._fetch(url) is None
+
+    mock_client.get.assert_called_once_with(
+        url,
+        headers={"If-None-Match": '"v1"'},
+        timeout=DOWNLOAD_TIMEOUT,
+        follow_redirects=True,
+    )
+
+
+def test_build_vectorstore_records_etag(loader):
+    """Test that a downloaded ETag is stored with the chunks and remembered."""
+    url = "https://cdn.example.com/EN_doc.txt"
+    loader._fetch = lambda url: (b"remote text", "text/plain", '"v2"')
+
+    documents = loader.load_from_url(url)
+    with (
+        patch("app.rag.loader.count_tokens", lambda text, model: len(text.split())),
+        patch.object(loader, "_add_chunks", return_value=["id"]) as mock_add,
+    ):
+        loader.build_vectorstore(documents)
+
+    chunks = mock_add.call_args.args[0]
+    assert chunks
+    assert all(chunk.metadata["etag"] == '"v2"' for chunk in chunks)
+    assert loader._etags[url] == '"v2"'
+
+
+def test_load_documents_combines_disk_and_bucket(loader):
+    """Test that local and downloaded documents are both returned."""
+    local = Document(page_content="local")
+    loader._load_from_disk = lambda: [local]
+    loader._list_bucket_files = lambda: ["docs/EN_remote.txt"]
+    loader._fetch = lambda url: (b"remote", "text/plain", "")
+
+    documents = loader.load_documents()
+
+    assert [doc.page_content for doc in documents] == ["local", "remote"]
+
+
+def _build_pdf(texts: list[str]) -> bytes:
+    """Build an in-memory PDF with one page per text (empty text, blank page)."""
+    with fitz.open() as doc:
+        for text in texts:
+            page = doc.new_page()
+            if text:
+                page.insert_text((72, 72), text)
+        return doc.tobytes()
+
+
+def test_load_pdf(loader):
+    """Test that PDFs are loaded as one Document per non-empty page."""
+    documents = loader._load_pdf(
+        _build_pdf(["first page", "", "third page"]), {"source": "file.pdf"}
+    )
+
+    assert [doc.metadata for doc in documents] == [
+        {"source": "file.pdf", "page": 0},
+        {"source": "file.pdf", "page": 2},
+    ]
+    assert documents[1].page_content.strip() == "third page"
+
+
+def test_load_pdf_in_worker_processes(loader):
+    """Test that large PDFs extracted by the process pool keep page order."""
+    content = _build_pdf([f"page {i}" for i in range(7)])
+
+    with (
+        patch("app.rag.loader.PARALLEL_PDF_MIN_PAGES", 2),
+        patch("app.rag.loader.PDF_WORKERS", 3),
+    ):
+        documents = loader._load_pdf(content, {})
+
+    assert [doc.metadata["page"] for doc in documents] == list(range(7))
+    assert documents[6].page_content.strip() == "page 6"
+
+
+def test_import_does_not_load_pymupdf():
+    """Test that importing the loader leaves PyMuPDF unloaded until a PDF is read."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, app.rag.loader; assert 'fitz' not in sys.modules",
+        ],
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.returncode == 0, result.stderr
+
+
+def test_pdf_executor_created_once_across_threads():
+    """Test that concurrent loaders share a single PDF process pool."""
+
+    def slow_pool(**kwargs):
+        time.sleep(0.05)
+        return object()
+
+    _get_pdf_executor.reset()
+    try:
+        with patch("app.rag.loader.ProcessPoolExecutor", side_effect=slow_pool) as mock:
+            with ThreadPoolExecutor(max_workers=4) as threads:
+                pools = list(threads.map(lambda _: _get_pdf_executor(), range(4)))
+    finally:
+        _get_pdf_executor.reset()
+
+    assert mock.call_count == 1
+    assert all(pool is pools[0] for pool in pools)
+
+
+class TestInitVectorstore:
+    """Tests for the init_vectorstore method."""
+
+    def test_reuses_populated_collection(self, loader):
+        """Test that a populated persisted collection is not rebuilt."""
+        loader.vectorstore._collection.count.return_value = 10
+
+        with patch.object(loader, "load_documents") as mock_load:
+            assert loader.init_vectorstore() is loader.vectorstore
+
+        mock_load.assert_not_called()
+
+    def test_force_reindex_rebuilds(self, loader):
+        """Test that FORCE_REINDEX rebuilds a populated collection."""
+        loader.vectorstore._collection.count.return_value = 10
+        documents = [Document(page_content="doc")]
+
+        with (
+            patch("app.rag.loader.FORCE_REINDEX", True),
+            patch.object(loader, "load_documents", return_value=documents),
+            patch.object(loader, "build_vectorstore") as mock_build,
+        ):
+            loader.init_vectorstore()
+
+        mock_build.assert_called_once_with(documents)
@@ -0,0 +1,223 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from lingua import Language
+
+from app.main import LANG_DETECT_MAX_CHARS, app, init_pipeline
+from app.utils.auth import verify_token
+
+
+def test_init_pipeline_shares_vectorstore():
+    """Test that the loader and the pipeline share one Chroma handle."""
+    vectorstore = SimpleNamespace(as_retriever=lambda **kwargs: SimpleNamespace())
+    loader = SimpleNamespace(
+        vectorstore=vectorstore, init_vectorstore=lambda: vectorstore
+    )
+
+    with (
+        patch("app.main.Loader", return_value=loader) as mock_loader,
+        patch("app.rag.rag_pipeline.get_embeddings"),
+    ):
+        result_loader, pipeline = init_pipeline("es", "collection")
+
+    mock_loader.assert_called_once_with(language="es", collection_name="collection")
+    assert result_loader is loader
+    assert pipeline.vectorstore is loader.vectorstore
+    assert pipeline.language == "es"
+
+
+def stub_pipeline(answer="Bogotá", sources=()):
+    """Pipeline stand-in returning a fixed answer."""
+    result = {
+        "answer": answer,
+        "rewritten_question": "Where does Luis live?",
+        "sources": tuple(sources),
+    }
+    return SimpleNamespace(
+        generate_answer=AsyncMock(return_value=result), clear_cache=MagicMock()
+    )
+
+
+@pytest.fixture
+def state():
+    """Stubbed pipelines, loaders and language detector in `app.state`."""
+    app.state.rag_pipeline = stub_pipeline()
+    app.state.esp_pipeline = stub_pipeline(answer="Bogotá, Colombia")
+    app.state.lang_detector = MagicMock()
+    app.state.lang_detector.detect_language_of.return_value = Language.ENGLISH
+    app.state.loaders = {"en": MagicMock(), "es": MagicMock()}
+    yield app.state
+    for name in ("rag_pipeline", "esp_pipeline", "lang_detector", "loaders"):
+        delattr(app.state, name)
+
+
+@pytest.fixture
+def client(state):
+    """Client for the app without its lifespan, authenticated."""
+    app.dependency_overrides[verify_token] = lambda: "testuser"
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def parse_events(body: str) -> list[dict]:
+    """Split a Server-Sent Events body into its JSON payloads."""
+    assert body.endswith("\n\n")
+    events = body.split("\n\n")[:-1]
+    assert all(event.startswith("data: ") for event in events)
+    return [json.loads(event.removeprefix("data: ")) for event in events]
+
+
+class TestGenerate:
+    """Tests for the /generate and /generate-debug endpoints."""
+
+    def test_generate_response(self, client, state):
+        """Test that the pipeline result is rendered as a GenerateResponse."""
+        state.rag_pipeline = stub_pipeline(
+            sources=[{"content": "I live in Bogotá", "metadata": {"page": 1}}]
+        )
+
+        response = client.post(
+            "/generate", json={"question": "Where?", "thread_id": "thread"}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        assert response.json() == {
+            "status": "success",
+            "message": "Answer generated successfully",
+            "answer": "Bogotá",
+            "sources": [{"content": "I live in Bogotá", "metadata": {"page": 1}}],
+            "thread_id": "thread",
+        }
+        state.rag_pipeline.generate_answer.assert_awaited_once_with(
+            question="Where?", thread_id="thread"
+        )
+
+    def test_generate_debug_renders_with_orjson(self, client, state):
+        """Test that the default response class serializes non-JSON types."""
+        state.rag_pipeline = stub_pipeline(
+            sources=[{"content": "chunk", "metadata": {"tags": {"cv"}}}]
+        )
+
+        response = client.post("/generate-debug", json={"question": "Where?"})
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["sources"] == [{"content": "chunk", "metadata": {"tags": ["cv"]}}]
+        assert body["rewritten_question"] == "Where does Luis live?"
+        assert body["thread_id"]
+
+    def test_generate_failure(self, client, state):
+        """Test that a pipeline error becomes a 500 response."""
+        state.rag_pipeline.generate_answer.side_effect = RuntimeError("boom")
+
+        response = client.post("/generate", json={"question": "Where?"})
+
+        assert response.status_code == 500
+        assert response.json() == {"detail": "Failed to generate answer: boom"}
+
+    @pytest.mark.parametrize(
+        "answer, compressed", [("short", False), ("long " * 300, True)]
+    )
+    def test_gzip_above_one_kilobyte(self, client, state, answer, compressed):
+        """Test that only responses of at least 1 KB are compressed."""
+        state.rag_pipeline = stub_pipeline(answer=answer)
+
+        response = client.post(
+            "/generate",
+            json={"question": "Where?"},
+            headers={"Accept-Encoding": "gzip"},
+        )
+
+        assert (response.headers.get("content-encoding") == "gzip") is compressed
+        assert response.json()["answer"] == answer
+
+    def test_spanish_question_uses_spanish_pipeline(self, client, state):
+        """Test that the detected language selects the pipeline."""
+        state.lang_detector.detect_language_of.return_value = Language.SPANISH
+        question = "¿Dónde vives? " * 50
+
+        response = client.post("/generate", json={"question": question})
+
+        assert response.json()["answer"] == "Bogotá, Colombia"
+        state.rag_pipeline.generate_answer.assert_not_awaited()
+        state.lang_detector.detect_language_of.assert_called_once_with(
+            question[:LANG_DETECT_MAX_CHARS]
+        )
+
+
+class TestGenerateStream:
+    """Tests for the /generate-stream endpoint."""
+
+    def test_stream_events(self, client, state):
+        """Test that tokens and the final answer are sent as SSE events."""
+
+        async def stream_answer(question, thread_id):
+            yield {"type": "token", "content": "Bogo"}
+            yield {"type": "token", "content": "tá"}
+            yield {
+                "type": "done",
+                "answer": "Bogotá",
+                "rewritten_question": question,
+                "sources": ({"content": "I live in Bogotá", "metadata": {}},),
+            }
+
+        state.rag_pipeline.stream_answer = stream_answer
+
+        response = client.post(
+            "/generate-stream", json={"question": "Where?", "thread_id": "thread"}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert parse_events(response.text) == [
+            {"type": "token", "content": "Bogo"},
+            {"type": "token", "content": "tá"},
+            {
+                "type": "done",
+                "answer": "Bogotá",
+                "sources": [{"content": "I live in Bogotá", "metadata": {}}],
+                "thread_id": "thread",
+            },
+        ]
+
+    def test_stream_error_event(self, client, state):
+        """Test that a failure mid-stream ends with an error event."""
+
+        async def stream_answer(question, thread_id):
+            yield {"type": "token", "content": "Bogo"}
+            raise RuntimeError("boom")
+
+        state.rag_pipeline.stream_answer = stream_answer
+
+        response = client.post("/generate-stream", json={"question": "Where?"})
+
+        assert parse_events(response.text) == [
+            {"type": "token", "content": "Bogo"},
+            {"type": "error", "message": "Failed to generate answer: boom"},
+        ]
+
+
+class TestUpload:
+    """Tests for the /upload endpoint."""
+
+    @pytest.mark.parametrize(
+        "url, language, pipeline",
+        [
+            ("https://cdn.example.com/ES_cv.pdf?v=2", "es", "esp_pipeline"),
+            ("https://cdn.example.com/EN_cv.pdf", "en", "rag_pipeline"),
+        ],
+    )
+    def test_upload_routes_by_filename(self, client, state, url, language, pipeline):
+        """Test that a document goes to the loader of its filename's language."""
+        other = "en" if language == "es" else "es"
+
+        response = client.post("/upload", json={"url": url})
+
+        assert response.status_code == 200
+        state.loaders[language].add_from_url.assert_called_once_with(url)
+        state.loaders[other].add_from_url.assert_not_called()
+        getattr(state, pipeline).clear_cache.assert_called_once_with()
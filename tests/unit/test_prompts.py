@@ -0,0 +1,41 @@
+from langchain.prompts import PromptTemplate
+
+from app.rag.prompts import (
+    ANSWER_PROMPT_TEMPLATES,
+    HISTORY_PROMPT_TEMPLATES,
+    HISTORY_PROMPTS,
+    PROMPT_TEMPLATES,
+    compact_prompt,
+)
+
+
+def test_compact_prompt():
+    """Test that indentation, trailing spaces and extra blank lines are removed."""
+    template = """
+        Rules:
+        1. First rule,
+           continued.   
+
+
+
+        Question: {input}
+        """
+
+    assert compact_prompt(template) == (
+        "Rules:\n1. First rule,\n   continued.\n\nQuestion: {input}"
+    )
+
+
+def test_templates_are_compacted():
+    """Test that the parsed templates carry no source indentation."""
+    for templates, sources in (
+        (HISTORY_PROMPT_TEMPLATES, HISTORY_PROMPTS),
+        (ANSWER_PROMPT_TEMPLATES, PROMPT_TEMPLATES),
+    ):
+        for language, prompt in templates.items():
+            assert not any(
+                line.startswith(" " * 4) for line in prompt.template.splitlines()
+            )
+            assert len(prompt.template) < len(sources[language])
+            raw = PromptTemplate.from_template(sources[language])
+            assert prompt.input_variables == raw.input_variables